@@ -9,3 +9,4 @@ with open("docker-compose.yml", "w") as file:
         file.write("    network_mode: host\n")
         file.write("    environment:\n")
         file.write(f"      - NODE_ID={i}\n")
+        file.write(f"      - NUM_NODES={num_nodes}\n")
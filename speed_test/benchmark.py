@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import psutil
+from attrs import asdict, field, frozen
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.simulation import NetworkProfile, Simulation  # noqa: E402
+from iot_node.at2_classes import AT2Configuration  # noqa: E402
+from iot_node.instrumentation import Instrumentation  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Metrics printed by compare, and whether bigger is better
+COMPARED_METRICS = {
+    "delivered_gossips_per_second": True,
+    "delivered_bytes_per_second": True,
+    "delivered_batches": True,
+    "delivery_latency_p50": False,
+    "delivery_latency_p95": False,
+    "delivery_latency_p99": False,
+    "cpu_seconds_per_node": False,
+    "time_to_ready": False,
+}
+
+
+@frozen
+class Scenario:
+    nodes: int
+    rate: float  # gossips per second across the cluster
+    duration: float = 60  # seconds of load
+    drain: float = 30  # seconds to wait for in flight gossips afterwards
+    padding_bytes: int = 389  # about the 10**935 padding main.py sends
+    at2: tuple = field(default=(6, 6, 6, 4, 5, 6), converter=tuple)
+    network: dict = field(factory=dict)  # NetworkProfile arguments, empty for none
+    node_kwargs: dict = field(factory=dict)
+    transport: str = "ipc"
+
+
+# main.py sends 5-15 gossips on half of its 1-2 second rounds, about 3.3 a
+# second per node
+SCENARIOS = {
+    "smoke": Scenario(7, 10, duration=20, drain=20),
+    "10_node": Scenario(10, 33),
+    "10_node_double_batch": Scenario(10, 66),
+    "10_node_dealer": Scenario(10, 33, node_kwargs={"transport_mode": "dealer"}),
+    "10_node_wan": Scenario(
+        10, 33, network={"latency": 0.05, "jitter": 0.01, "bandwidth": 12_500_000}
+    ),
+    "100_node": Scenario(100, 330, drain=60),
+    "100_node_double_batch": Scenario(100, 660, drain=60),
+}
+
+
+def git_commit() -> dict:
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain"))}
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def relative_series(series: list, started: float) -> list:
+    # (unix time, value) pairs as (seconds since the run started, value)
+    return [(timestamp - started, value) for timestamp, value in series]
+
+
+async def run_scenario(name: str, scenario: Scenario, seed: int = None) -> dict:
+    simulation = Simulation(
+        scenario.nodes,
+        AT2Configuration(*scenario.at2),
+        transport=scenario.transport,
+        network=NetworkProfile(**scenario.network) if scenario.network else None,
+        seed=seed,
+        node_kwargs=scenario.node_kwargs,
+    )
+    try:
+        await simulation.start()
+    except TimeoutError:
+        simulation.stop()
+        raise
+
+    process = psutil.Process()
+    cpu_before = process.cpu_times()
+    started = time.time()
+
+    padding = (1 << (8 * scenario.padding_bytes)) - 1
+    await simulation.run_load(scenario.duration, scenario.rate, padding)
+    await simulation.drain(scenario.drain)
+
+    elapsed = time.time() - started
+    cpu_after = process.cpu_times()
+    cpu_seconds = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    nodes = simulation.nodes
+    simulation.stop()
+
+    delivered = [entry for node in nodes for entry in node.delivered_msg_metadata]
+    delivered_gossips = sum(batch_size for _, batch_size in delivered)
+    latencies = [latency for node in nodes for _, latency in node.delivery_latency_metadata]
+    latency_percentiles = percentiles(latencies)
+
+    return {
+        "scenario": name,
+        "parameters": asdict(scenario),
+        "seed": seed,
+        "git": git_commit(),
+        "host": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "started": started,
+        "elapsed": elapsed,
+        "metrics": {
+            "submitted_gossips": simulation.sent_gossips,
+            "sent_batches": sum(node.sent_gossips for node in nodes),
+            "delivered_batches": len(delivered),
+            "delivered_gossips": delivered_gossips,
+            "delivered_gossips_per_second": delivered_gossips / elapsed,
+            "delivered_bytes_per_second": delivered_gossips * scenario.padding_bytes / elapsed,
+            "delivery_latency_p50": latency_percentiles["p50"],
+            "delivery_latency_p95": latency_percentiles["p95"],
+            "delivery_latency_p99": latency_percentiles["p99"],
+            # Every node shares this process, so CPU is split evenly between them
+            "cpu_seconds_per_node": cpu_seconds / len(nodes),
+            "cpu_percent_per_node": 100 * cpu_seconds / elapsed / len(nodes),
+            "time_to_ready": max(node.time_to_ready or 0 for node in nodes),
+        },
+        # Stage timings and task counts, summed over every node
+        "instrumentation": Instrumentation.merge(
+            [node.instrumentation for node in nodes]
+        ).snapshot(),
+        "series": {
+            "delivered_msg_metadata": sorted(
+                relative_series(
+                    [entry for node in nodes for entry in node.delivered_msg_metadata],
+                    started,
+                )
+            ),
+            "current_latency_metadata": sorted(
+                relative_series(
+                    [entry for node in nodes for entry in node.current_latency_metadata],
+                    started,
+                )
+            ),
+            "delivery_latency_metadata": sorted(
+                relative_series(
+                    [entry for node in nodes for entry in node.delivery_latency_metadata],
+                    started,
+                )
+            ),
+        },
+    }
+
+
+def compare(old: dict, new: dict):
+    print(f"{'metric':32} {'old':>12} {'new':>12} {'change':>9}")
+
+    for metric, bigger_is_better in COMPARED_METRICS.items():
+        before = old["metrics"].get(metric)
+        after = new["metrics"].get(metric)
+
+        if before is None or after is None:
+            print(f"{metric:32} {str(before):>12} {str(after):>12}")
+            continue
+
+        change = (after - before) / before * 100 if before else 0.0
+        better = (change > 0) == bigger_is_better if change else None
+        verdict = {True: "better", False: "worse", None: ""}[better]
+        print(f"{metric:32} {before:12.3f} {after:12.3f} {change:+8.1f}% {verdict}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Throughput and latency benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="show the scenarios")
+
+    run = commands.add_parser("run", help="run scenarios and write their results")
+    run.add_argument("scenarios", nargs="+", choices=sorted(SCENARIOS))
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--output-dir", default=RESULTS_DIR)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.command == "list":
+        for name, scenario in SCENARIOS.items():
+            print(f"{name}: {asdict(scenario)}")
+
+    elif args.command == "run":
+        os.makedirs(args.output_dir, exist_ok=True)
+
+        for name in args.scenarios:
+            try:
+                results = asyncio.run(run_scenario(name, SCENARIOS[name], args.seed))
+            except TimeoutError as error:
+                sys.exit(f"{name} never reached cluster_ready: {error}")
+
+            path = os.path.join(
+                args.output_dir, f"{name}-{results['git']['commit'][:10]}-{int(results['started'])}.json"
+            )
+            with open(path, "w") as results_file:
+                json.dump(results, results_file)
+
+            print(json.dumps(results["metrics"], indent=2))
+            print(f"Wrote {path}")
+
+    elif args.command == "compare":
+        with open(args.old) as old, open(args.new) as new:
+            compare(json.load(old), json.load(new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+from scipy.stats import poisson, norm
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.sampling import PeerSampler  # noqa: E402
+
+PEER_COUNTS = [10, 100, 1000]
+SAMPLE_SIZE = 6  # echo/ready sample size used in main.py
+CALLS = 200
+
+
+def legacy_select_nodes(peers: dict, algorithm: str, num_nodes_to_select: int) -> set:
+    # select_nodes before the PeerSampler, kept here for comparison
+    selected_nodes = set()
+
+    if algorithm == "poisson":
+        num_nodes = len(peers)
+        poisson_distribution = poisson(5)
+
+        while len(selected_nodes) < num_nodes_to_select:
+            selected_indices = (
+                poisson_distribution.rvs(size=num_nodes_to_select) % num_nodes
+            )
+            selected_nodes = set([list(peers)[index] for index in selected_indices])
+    elif algorithm == "normal":
+        mean, std_dev = (len(peers) - 1) / 2, np.sqrt(len(peers))
+        while len(selected_nodes) < num_nodes_to_select:
+            selected_indices = norm.rvs(
+                loc=mean, scale=std_dev, size=num_nodes_to_select
+            )
+            selected_indices = [int(idx) % len(peers) for idx in selected_indices]
+            selected_nodes = set([list(peers)[idx] for idx in selected_indices])
+    elif algorithm == "random":
+        selected_nodes = random.sample(list(peers), num_nodes_to_select)
+
+    return set(selected_nodes)
+
+
+def per_call_us(fn) -> float:
+    fn()  # warm the caches
+    return timeit.timeit(fn, number=CALLS) / CALLS * 1e6
+
+
+def main():
+    print(f"{'peers':>6} {'algorithm':>10} {'legacy us':>12} {'sampler us':>12} {'speedup':>8}")
+
+    for num_peers in PEER_COUNTS:
+        peers = {str(i): None for i in range(num_peers)}
+        sampler = PeerSampler()
+        sampler.set_peers(peers)
+
+        for algorithm in ["normal", "poisson", "random"]:
+            legacy = per_call_us(
+                lambda: legacy_select_nodes(peers, algorithm, SAMPLE_SIZE)
+            )
+            vectorised = per_call_us(lambda: sampler.sample(algorithm, SAMPLE_SIZE))
+
+            print(
+                f"{num_peers:>6} {algorithm:>10} {legacy:>12.1f} {vectorised:>12.1f} {legacy / vectorised:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,106 +1,110 @@
-from py_ecc.bls import G2ProofOfPossession as bls_pop
-import sys
-import base64
-
-private_key = 5566
-public_key = bls_pop.SkToPk(private_key)
-# print(public_key)
-
-# x = base64.b64encode(public_key).decode("utf-8")
-# x = base64.b64decode(x)
-
-# print(x)
-
-
-message = b"\xab" * 32  # The message to be signed
-
-# Signing
-signature = bls_pop.Sign(private_key, message)
-
-# Verifying
-assert bls_pop.Verify(public_key, message, signature)
-
-# private_keys = [5566, 5566, 5566, 5566, 5566, 5566, 5566, 5566, 5566]
-
-
-# messages = [
-#     b"\xaa" * 42,
-#     b"\xbb" * 32,
-#     b"\xcc" * 64,
-#     b"\xaa" * 42,
-#     b"\xbb" * 32,
-#     b"\xcc" * 64,
-#     b"\xaa" * 42,
-#     b"\xbb" * 32,
-#     b"\xcc" * 64,
-# ]
-
-# signatures = [
-#     bls_pop.Sign(key, message) for key, message in zip(private_keys, messages)
-# ]
-
-# print(sys.getsizeof(signatures))
-
-# agg_sig = bls_pop.Aggregate(signatures)
-
-# print(sys.getsizeof(agg_sig))
-
-
-# # Verify aggregate signature with different messages
-# assert bls_pop.AggregateVerify(
-#     [
-#         public_key,
-#         public_key,
-#         public_key,
-#         public_key,
-#         public_key,
-#         public_key,
-#         public_key,
-#         public_key,
-#         public_key,
-#     ],
-#     messages,
-#     agg_sig,
-# )
-
-
-from fastecdsa import curve, ecdsa, keys
-import sys
-
-m = "a message to sign via ECDSA"  # some message
-m2 = "a message to sign vasdfsdafsdafia ECDSA"
-m3 = "a message to sign vsadfsafasfia ECDSA"
-m4 = "a message tsadfsafsafo sign via ECDSA"
-m5 = "a message tsdfsfasfo sign via ECDSA"
-m6 = "a message to sigadsfsdafsafn via ECDSA"
-m7 = "a message to sisadfsfsfgn via ECDSA"
-m8 = "a messasdfsfsafge to sign via ECDSA"
-m9 = "a message to sign dsfsfsafsafvia ECDSA"
-
-""" use default curve and hash function (P256 and SHA2) """
-private_key = keys.gen_private_key(curve.P256)
-public_key = keys.get_public_key(private_key, curve.P256)
-# standard signature, returns two integers
-r, s = ecdsa.sign(m, private_key)
-r, s = ecdsa.sign(m2, private_key)
-r, s = ecdsa.sign(m3, private_key)
-r, s = ecdsa.sign(m4, private_key)
-r, s = ecdsa.sign(m5, private_key)
-r, s = ecdsa.sign(m6, private_key)
-r, s = ecdsa.sign(m7, private_key)
-r, s = ecdsa.sign(m8, private_key)
-r, s = ecdsa.sign(m9, private_key)
-
-print(sys.getsizeof(r) * 9)
-print(sys.getsizeof(s) * 9)
-
-# should return True as the signature we just generated is valid.
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
-valid = ecdsa.verify((r, s), m, public_key)
+import argparse
+import json
+import time
+
+from iot_node.crypto import BLS_BACKENDS
+from iot_node.crypto import SIGNATURE_SCHEMES
+from iot_node.crypto import available
+from iot_node.crypto import get_bls_backend
+from iot_node.crypto import get_signature_scheme
+
+# About the size of a BatchedMessage's creator bytes
+MESSAGE = b"\xab" * 300
+
+
+def ops_per_second(operation, seconds: float) -> float:
+    # Repeats operation for at least `seconds`, and at least twice
+    count = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+
+    while elapsed < seconds or count < 2:
+        operation(count)
+        count += 1
+        elapsed = time.perf_counter() - started
+
+    return count / elapsed
+
+
+def bench_signatures(name: str, seconds: float) -> dict:
+    scheme = get_signature_scheme(name)
+    private_key, public_key = scheme.generate_keys()
+    signature = scheme.sign(MESSAGE, private_key)
+    assert scheme.verify(signature, MESSAGE, public_key)
+
+    def sign(i):
+        scheme.sign(MESSAGE + i.to_bytes(4, "big"), private_key)
+
+    def verify(i):
+        scheme.verify(signature, MESSAGE, public_key)
+
+    return {
+        "sign": ops_per_second(sign, seconds),
+        "verify": ops_per_second(verify, seconds),
+    }
+
+
+def bench_bls(name: str, seconds: float, batch_size: int) -> dict:
+    backend = get_bls_backend(name)
+    private_key, public_key = backend.generate_keys()
+    messages = [MESSAGE + i.to_bytes(4, "big") for i in range(batch_size)]
+    signature = backend.sign_batch(private_key, messages)
+    assert backend.verify_batch(public_key, messages, signature)
+
+    def sign(i):
+        backend.sign_batch(private_key, messages)
+
+    def verify(i):
+        backend.verify_batch(public_key, messages, signature)
+
+    sign_rate = ops_per_second(sign, seconds)
+    verify_rate = ops_per_second(verify, seconds)
+
+    # Per message, so different batch sizes can be compared
+    return {"sign": sign_rate * batch_size, "verify": verify_rate * batch_size}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Sign and verify ops/s for each crypto provider"
+    )
+    parser.add_argument("--seconds", type=float, default=2, help="time per measurement")
+    parser.add_argument("--batch-size", type=int, default=10, help="messages per BLS batch")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = {"signatures": {}, "bls": {}}
+
+    for name in SIGNATURE_SCHEMES:
+        if name in available(SIGNATURE_SCHEMES):
+            results["signatures"][name] = bench_signatures(name, args.seconds)
+        else:
+            results["signatures"][name] = None
+
+    for name in BLS_BACKENDS:
+        if name in available(BLS_BACKENDS):
+            results["bls"][name] = bench_bls(name, args.seconds, args.batch_size)
+        else:
+            results["bls"][name] = None
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'provider':24} {'sign ops/s':>12} {'verify ops/s':>12}")
+    for kind, providers in results.items():
+        for name, result in providers.items():
+            label = f"{kind}/{name}" + (f" (x{args.batch_size})" if kind == "bls" else "")
+            if result is None:
+                print(f"{label:24} {'not installed':>25}")
+            else:
+                print(f"{label:24} {result['sign']:12.1f} {result['verify']:12.1f}")
+
+    print(f"BLS rates are messages per second, signed and verified {args.batch_size} per batch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from attrs import frozen, field, validators
+
+
+@frozen
+class AddressPlan:
+    # Where the index'th node's router and publisher live. With tcp the
+    # router is on router_port + index and the publisher on publisher_port + index.
+    transport: str = field(default="tcp", validator=[validators.in_(["tcp", "ipc"])])
+    host: str = field(default="127.0.0.1")
+    router_port: int = field(default=20001)
+    publisher_port: int = field(default=21001)
+    ipc_dir: str = field(default="/tmp/racer")
+
+    def router(self, index: int) -> str:
+        if self.transport == "ipc":
+            return f"ipc://{self.ipc_dir}/node-{index}-router"
+
+        return f"tcp://{self.host}:{self.router_port + index}"
+
+    def publisher(self, index: int) -> str:
+        if self.transport == "ipc":
+            return f"ipc://{self.ipc_dir}/node-{index}-publisher"
+
+        return f"tcp://{self.host}:{self.publisher_port + index}"
@@ -0,0 +1,96 @@
+from attrs import define, field
+from collections import deque
+from typing import Callable, Optional
+import asyncio
+
+
+@define
+class AdaptiveFlushScheduler:
+    # Runs flush() every `interval` seconds from inside the event loop, or
+    # straight away once max_pending_count items or max_pending_bytes bytes
+    # are waiting. Changing the interval takes effect immediately.
+    flush: Callable = field()  # coroutine function
+    interval: float = field()
+    max_pending_count: Optional[int] = field(default=None)
+    max_pending_bytes: Optional[int] = field(default=None)
+    logger = field(default=None)
+
+    pending_count: int = field(default=0)
+    pending_bytes: int = field(default=0)
+    wakeup: asyncio.Event = field(factory=asyncio.Event)
+    task: asyncio.Task = field(default=None)
+    last_flush: float = field(default=None)  # loop time of the last flush
+    intervals: deque = field(factory=lambda: deque(maxlen=20))  # achieved intervals
+    flushes: int = field(default=0)
+    size_flushes: int = field(default=0)  # flushes triggered by count or bytes
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def set_interval(self, interval: float):
+        self.interval = interval
+        self.wakeup.set()
+
+    def notify(self, count: int = 1, size: int = 0):
+        self.pending_count += count
+        self.pending_bytes += size
+
+        if self.size_triggered():
+            self.wakeup.set()
+
+    def size_triggered(self) -> bool:
+        return (
+            self.max_pending_count is not None
+            and self.pending_count >= self.max_pending_count
+        ) or (
+            self.max_pending_bytes is not None
+            and self.pending_bytes >= self.max_pending_bytes
+        )
+
+    @property
+    def achieved_interval(self) -> Optional[float]:
+        # Mean time between recent flushes
+        if not self.intervals:
+            return None
+
+        return sum(self.intervals) / len(self.intervals)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.last_flush = loop.time()
+
+        while True:
+            self.wakeup.clear()
+            remaining = self.last_flush + self.interval - loop.time()
+            size_triggered = self.size_triggered()
+
+            if remaining > 0 and not size_triggered:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), remaining)
+                    # Woken by a new interval or enough pending work, check again
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            now = loop.time()
+            self.intervals.append(now - self.last_flush)
+            self.last_flush = now
+            self.flushes += 1
+            if size_triggered:
+                self.size_flushes += 1
+
+            self.pending_count = 0
+            self.pending_bytes = 0
+
+            try:
+                await self.flush()
+            except Exception:
+                if self.logger is not None:
+                    self.logger.exception("Flush failed")
+
+            # flush() may not await anything, don't starve the loop on short intervals
+            await asyncio.sleep(0)
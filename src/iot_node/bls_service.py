@@ -0,0 +1,98 @@
+from attrs import define, field, validators
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from .crypto import BLS_BACKENDS
+from .crypto import get_bls_backend
+from .message_classes import response_batch_bytes
+import asyncio
+import base64
+import hashlib
+import multiprocessing
+
+
+def sign_batch(private_key: int, messages: list, backend: str = "py_ecc") -> str:
+    # Runs in a worker process
+    signature = get_bls_backend(backend).sign_batch(private_key, messages)
+    return base64.b64encode(signature).decode("utf-8")
+
+
+def verify_batch(
+    public_key: bytes, messages: list, signature: str, backend: str = "py_ecc"
+) -> bool:
+    # Runs in a worker process
+    try:
+        signature_bytes = base64.b64decode(signature)
+    except ValueError:
+        return False
+
+    return get_bls_backend(backend).verify_batch(public_key, messages, signature_bytes)
+
+
+@define
+class BlsService:
+    # BLS signing and aggregate verification on a process pool. At most
+    # max_pending jobs are queued, callers wait for space after that.
+    workers: int = field(default=2, validator=[validators.instance_of(int)])
+    backend: str = field(default="py_ecc", validator=[validators.in_(list(BLS_BACKENDS))])
+    max_pending: int = field(default=256)
+    result_cache_size: int = field(default=4096)
+
+    executor: ProcessPoolExecutor = field(default=None)
+    slots: asyncio.Semaphore = field(default=None)
+    results: OrderedDict = field(factory=OrderedDict)  # digest -> verification task
+    cache_hits: int = field(default=0)
+
+    def start(self):
+        # spawn, so workers don't inherit the parents zmq sockets and event loop
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self.slots = asyncio.Semaphore(self.max_pending)
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, function, *args):
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, function, *args)
+
+    async def sign(self, private_key: int, messages: list) -> str:
+        return await self.run(sign_batch, private_key, messages, self.backend)
+
+    async def verify(self, public_key: bytes, messages: list, signature: str) -> bool:
+        # Every gossiper forwards the same batch, so concurrent and repeated
+        # checks of it share one result. Length prefixed, so moving bytes
+        # between messages can't reuse another batch's result.
+        digest = hashlib.sha256(
+            response_batch_bytes([public_key, signature.encode(), *messages])
+        ).digest()
+
+        task = self.results.get(digest)
+        if task is not None:
+            self.cache_hits += 1
+            self.results.move_to_end(digest)
+        else:
+            task = asyncio.ensure_future(
+                self.run(verify_batch, public_key, messages, signature, self.backend)
+            )
+            self.results[digest] = task
+
+            while len(self.results) > self.result_cache_size:
+                self.results.popitem(last=False)
+
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # A failed job says nothing about the batch, let it be retried
+            self.results.pop(digest, None)
+            return False
+
+    def statistics(self) -> dict:
+        return {
+            "backend": self.backend,
+            "cached_results": len(self.results),
+            "cache_hits": self.cache_hits,
+        }
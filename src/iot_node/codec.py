@@ -0,0 +1,440 @@
+from attrs import asdict
+from typing import Callable, Optional
+import base64
+import json
+import struct
+
+from .message_classes import DirectMessage
+from .message_classes import BatchedMessages
+from .message_classes import Gossip
+from .message_classes import PeerDiscovery
+from .message_classes import Echo
+from .message_classes import Response
+
+# Binary frames start with this byte. JSON frames always start with "{" (or a
+# topic for publishes), so the first byte tells the codecs apart.
+BINARY_MAGIC = 0xB1
+BINARY_VERSION = 1
+
+KIND_BATCHED_MESSAGE = 1
+KIND_ECHO = 2
+KIND_RESPONSES = 3
+
+# How compact strings were stored
+TEXT_UTF8 = 0
+TEXT_BASE64 = 1
+TEXT_HEX = 2
+
+# Publishes sent with subscription_mode 'topic' get an extra first frame that
+# ZMQ matches subscriptions against. It starts with a zero byte, which JSON and
+# binary response frames never do.
+TOPIC_PREFIX_MARKER = b"\x00"
+
+# What decoding a malformed frame from a peer can raise: bad JSON or UTF-8
+# (ValueError), missing or mistyped fields (KeyError, TypeError, attrs
+# validators), too few frames (IndexError) and truncated binary (struct.error)
+DECODE_ERRORS = (ValueError, KeyError, TypeError, IndexError, struct.error)
+
+HEADER = struct.Struct(">BBB")
+COORDINATE_SIZE = 32  # P256 coordinates and signature values fit in 32 bytes
+
+
+def message_from_dict(msg: dict):
+    message_type = msg["message_type"]
+
+    if message_type == "BatchedMessage":
+        msg["messages"] = tuple([Gossip(**x) for x in msg["messages"]])
+        return BatchedMessages(**msg)
+    elif message_type == "PeerDiscovery":
+        return PeerDiscovery(**msg)
+    elif message_type in ["EchoSubscribe", "ReadySubscribe"]:
+        return Echo(**msg)
+    elif message_type in ["DirectMessage", "Heartbeat"]:
+        return DirectMessage(**msg)
+
+    raise ValueError(f"Unrecognised message type: {message_type}")
+
+
+class JsonCodec:
+    name = "json"
+    version = 0
+
+    def encode_message(self, message) -> bytes:
+        return json.dumps(asdict(message)).encode()
+
+    def decode_message(self, frame: bytes):
+        return message_from_dict(json.loads(frame.decode()))
+
+    def encode_signature(self, signature: tuple) -> bytes:
+        return json.dumps(signature).encode()
+
+    def decode_signature(self, frame: bytes) -> tuple:
+        signature = tuple(json.loads(frame.decode()))
+        if len(signature) != 2 or not all(isinstance(value, int) for value in signature):
+            raise ValueError("JSON signatures must be a pair of integers")
+
+        return signature
+
+    def encode_responses(
+        self, responses: list, signatures: Optional[list] = None
+    ) -> list:
+        # One multipart message, three frames per response: topic, response, signature.
+        # Without signatures the signature frames are left empty and the
+        # publisher appends one batch signature frame instead.
+        frames = []
+
+        for i, resp in enumerate(responses):
+            frames.append(resp.topic.encode())
+            frames.append(json.dumps(asdict(resp)).encode())
+            frames.append(b"" if signatures is None else json.dumps(signatures[i]).encode())
+
+        return frames
+
+    def split_batch_signature(self, frames: list) -> tuple:
+        # A batch signature adds one frame after the response triples
+        if len(frames) % 3 == 1:
+            return frames[:-1], self.decode_signature(frames[-1])
+
+        return frames, None
+
+    def decode_responses(
+        self, frames: list, wanted: Optional[Callable] = None
+    ) -> list:
+        # wanted(topic) lets the caller skip parsing responses it doesn't care about
+        decoded = []
+
+        for i in range(0, len(frames) - 2, 3):
+            topic = frames[i].decode()
+            if wanted is not None and not wanted(topic):
+                continue
+
+            decoded.append(
+                (
+                    topic,
+                    Response(**json.loads(frames[i + 1])),
+                    self.decode_signature(frames[i + 2]) if frames[i + 2] else None,
+                )
+            )
+
+        return decoded
+
+
+class BinaryWriter:
+    def __init__(self, kind: int):
+        self.parts = [HEADER.pack(BINARY_MAGIC, BINARY_VERSION, kind)]
+
+    def u8(self, value: int):
+        self.parts.append(struct.pack(">B", value))
+
+    def u16(self, value: int):
+        self.parts.append(struct.pack(">H", value))
+
+    def u32(self, value: int):
+        self.parts.append(struct.pack(">I", value))
+
+    def u64(self, value: int):
+        self.parts.append(struct.pack(">Q", value))
+
+    def i64(self, value: int):
+        self.parts.append(struct.pack(">q", value))
+
+    def blob(self, value: bytes):
+        self.u32(len(value))
+        self.parts.append(value)
+
+    def string(self, value: str):
+        encoded = value.encode()
+        self.u16(len(encoded))
+        self.parts.append(encoded)
+
+    def text(self, value: str):
+        # hex and base64 strings are sent as the raw bytes they encode
+        try:
+            raw = bytes.fromhex(value)
+            if raw and raw.hex() == value:
+                self.u8(TEXT_HEX)
+                self.blob(raw)
+                return
+        except ValueError:
+            pass
+
+        try:
+            raw = base64.b64decode(value, validate=True)
+            if raw and base64.b64encode(raw).decode() == value:
+                self.u8(TEXT_BASE64)
+                self.blob(raw)
+                return
+        except ValueError:
+            # binascii.Error, or a plain ValueError for non-ASCII text
+            pass
+
+        self.u8(TEXT_UTF8)
+        self.blob(value.encode())
+
+    def integer(self, value: int):
+        self.blob(value.to_bytes((value.bit_length() + 8) // 8, "big", signed=True))
+
+    def pair(self, value: tuple):
+        # ECDSA public keys and signatures, as raw 32 byte big endian values
+        self.parts.append(value[0].to_bytes(COORDINATE_SIZE, "big"))
+        self.parts.append(value[1].to_bytes(COORDINATE_SIZE, "big"))
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.parts)
+
+
+class BinaryReader:
+    def __init__(self, frame: bytes, kind: int):
+        self.view = memoryview(frame)
+        self.offset = HEADER.size
+
+        magic, version, frame_kind = HEADER.unpack_from(self.view, 0)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION or frame_kind != kind:
+            raise ValueError(
+                f"Unexpected binary frame magic: {magic} version: {version} kind: {frame_kind}"
+            )
+
+    def unpack(self, fmt: str) -> int:
+        value = struct.unpack_from(fmt, self.view, self.offset)[0]
+        self.offset += struct.calcsize(fmt)
+        return value
+
+    def u8(self) -> int:
+        return self.unpack(">B")
+
+    def u16(self) -> int:
+        return self.unpack(">H")
+
+    def u32(self) -> int:
+        return self.unpack(">I")
+
+    def u64(self) -> int:
+        return self.unpack(">Q")
+
+    def i64(self) -> int:
+        return self.unpack(">q")
+
+    def raw(self, size: int) -> bytes:
+        value = self.view[self.offset : self.offset + size]
+        if len(value) != size:
+            raise ValueError("Truncated binary frame")
+        self.offset += size
+        return bytes(value)
+
+    def blob(self) -> bytes:
+        return self.raw(self.u32())
+
+    def string(self) -> str:
+        return self.raw(self.u16()).decode()
+
+    def text(self) -> str:
+        mode = self.u8()
+        raw = self.blob()
+
+        if mode == TEXT_BASE64:
+            return base64.b64encode(raw).decode()
+        elif mode == TEXT_HEX:
+            return raw.hex()
+
+        return raw.decode()
+
+    def integer(self) -> int:
+        return int.from_bytes(self.blob(), "big", signed=True)
+
+    def pair(self) -> tuple:
+        return (
+            int.from_bytes(self.raw(COORDINATE_SIZE), "big"),
+            int.from_bytes(self.raw(COORDINATE_SIZE), "big"),
+        )
+
+
+class BinaryCodec:
+    name = "binary"
+    version = BINARY_VERSION
+
+    def encode_message(self, message) -> bytes:
+        if isinstance(message, BatchedMessages):
+            return self.encode_batched_message(message)
+        elif isinstance(message, Echo):
+            writer = BinaryWriter(KIND_ECHO)
+            writer.string(message.message_type)
+            writer.text(message.batched_messages_hash)
+            writer.pair(message.creator)
+            return writer.getvalue()
+
+        # Anything else (PeerDiscovery etc) isn't on the hot path
+        return JSON_CODEC.encode_message(message)
+
+    def encode_batched_message(self, bm: BatchedMessages) -> bytes:
+        writer = BinaryWriter(KIND_BATCHED_MESSAGE)
+        writer.string(bm.message_type)
+        writer.text(bm.creator_bls)
+        writer.pair(bm.creator_ecdsa)
+        writer.pair(bm.sender_ecdsa)
+        writer.text(bm.aggregated_bls_signature)
+        writer.text(bm.merkle_root)
+
+        writer.u16(len(bm.vector_clock))
+        for node_id, clock in bm.vector_clock:
+            writer.string(node_id)
+            writer.u64(clock)
+
+        writer.u32(len(bm.messages))
+        for gossip in bm.messages:
+            writer.string(gossip.message_type)
+            writer.i64(gossip.timestamp)
+            writer.integer(gossip.padding)
+
+        return writer.getvalue()
+
+    def decode_message(self, frame: bytes):
+        if frame[0] != BINARY_MAGIC:
+            return JSON_CODEC.decode_message(frame)
+
+        kind = frame[2]
+        if kind == KIND_BATCHED_MESSAGE:
+            return self.decode_batched_message(frame)
+        elif kind == KIND_ECHO:
+            reader = BinaryReader(frame, KIND_ECHO)
+            return Echo(
+                message_type=reader.string(),
+                batched_messages_hash=reader.text(),
+                creator=reader.pair(),
+            )
+
+        raise ValueError(f"Unrecognised binary message kind: {kind}")
+
+    def decode_batched_message(self, frame: bytes) -> BatchedMessages:
+        reader = BinaryReader(frame, KIND_BATCHED_MESSAGE)
+        message_type = reader.string()
+        creator_bls = reader.text()
+        creator_ecdsa = reader.pair()
+        sender_ecdsa = reader.pair()
+        aggregated_bls_signature = reader.text()
+        merkle_root = reader.text()
+
+        vector_clock = tuple(
+            [(reader.string(), reader.u64()) for _ in range(reader.u16())]
+        )
+
+        messages = tuple(
+            [
+                Gossip(
+                    message_type=reader.string(),
+                    timestamp=reader.i64(),
+                    padding=reader.integer(),
+                )
+                for _ in range(reader.u32())
+            ]
+        )
+
+        return BatchedMessages(
+            message_type=message_type,
+            creator_bls=creator_bls,
+            creator_ecdsa=creator_ecdsa,
+            sender_ecdsa=sender_ecdsa,
+            messages=messages,
+            aggregated_bls_signature=aggregated_bls_signature,
+            merkle_root=merkle_root,
+            vector_clock=vector_clock,
+        )
+
+    def encode_signature(self, signature: tuple) -> bytes:
+        return b"".join(
+            [
+                signature[0].to_bytes(COORDINATE_SIZE, "big"),
+                signature[1].to_bytes(COORDINATE_SIZE, "big"),
+            ]
+        )
+
+    def decode_signature(self, frame: bytes) -> tuple:
+        if len(frame) != COORDINATE_SIZE * 2:
+            raise ValueError("Binary signatures must be 64 bytes")
+
+        return (
+            int.from_bytes(frame[:COORDINATE_SIZE], "big"),
+            int.from_bytes(frame[COORDINATE_SIZE:], "big"),
+        )
+
+    def encode_responses(
+        self, responses: list, signatures: Optional[list] = None
+    ) -> list:
+        writer = BinaryWriter(KIND_RESPONSES)
+        writer.u32(len(responses))
+        writer.u8(signatures is not None)  # 0 when a batch signature follows
+
+        for i, resp in enumerate(responses):
+            writer.text(resp.topic)
+            writer.string(resp.message_type)
+            writer.pair(resp.creator)
+            if signatures is not None:
+                writer.pair(signatures[i])
+
+        return [writer.getvalue()]
+
+    def split_batch_signature(self, frames: list) -> tuple:
+        if len(frames) == 2:
+            return frames[:1], self.decode_signature(frames[1])
+
+        return frames, None
+
+    def decode_responses(
+        self, frames: list, wanted: Optional[Callable] = None
+    ) -> list:
+        reader = BinaryReader(frames[0], KIND_RESPONSES)
+        count = reader.u32()
+        signed = reader.u8()
+        decoded = []
+
+        for _ in range(count):
+            topic = reader.text()
+            message_type = reader.string()
+            creator = reader.pair()
+            sig = reader.pair() if signed else None
+
+            if wanted is not None and not wanted(topic):
+                continue
+
+            decoded.append((topic, Response(message_type, topic, creator), sig))
+
+        return decoded
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+
+CODECS = {codec.name: codec for codec in [JSON_CODEC, BINARY_CODEC]}
+CODECS_BY_VERSION = {codec.version: codec for codec in [JSON_CODEC, BINARY_CODEC]}
+
+
+def topic_prefix(topic: str, publisher_id: str) -> bytes:
+    # Terminated, so subscribing to one peer id never matches a longer one
+    return b"".join(
+        [
+            TOPIC_PREFIX_MARKER,
+            topic.encode(),
+            TOPIC_PREFIX_MARKER,
+            publisher_id.encode(),
+            TOPIC_PREFIX_MARKER,
+        ]
+    )
+
+
+def strip_topic_prefix(frames: list) -> list:
+    if frames and frames[0][:1] == TOPIC_PREFIX_MARKER:
+        return frames[1:]
+
+    return frames
+
+
+def codec_for_frame(frame: bytes):
+    # Pick the codec a frame was written with
+    if frame and frame[0] == BINARY_MAGIC:
+        return BINARY_CODEC
+
+    return JSON_CODEC
+
+
+def negotiate_codec(*versions: int):
+    # Use the newest codec every side understands
+    return CODECS_BY_VERSION[min(versions)]
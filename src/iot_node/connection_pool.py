@@ -0,0 +1,193 @@
+from attrs import define, field, validators
+from typing import Callable, Optional, Union
+import asyncio
+import aiozmq
+import json
+import time
+import zmq
+
+from .dealer_transport import DealerChannel
+
+HEARTBEAT = json.dumps({"message_type": "Heartbeat"}).encode()
+
+
+async def create_stream(zmq_type, bind=None, connect=None) -> aiozmq.ZmqStream:
+    # Default stream factory, simulation.SimulatedNetwork can stand in for it
+    return await aiozmq.create_zmq_stream(zmq_type, bind=bind, connect=connect)
+
+
+@define
+class ReqChannel:
+    # A REQ socket to a single peer. REQ sockets strictly alternate write and
+    # read, so requests take turns behind lock, and one that never got its
+    # reply can't be used again.
+    router_address: str = field(validator=[validators.instance_of(str)])
+    socket: aiozmq.ZmqStream = field(
+        validator=[validators.instance_of(aiozmq.ZmqStream)]
+    )
+    lock: asyncio.Lock = field(factory=asyncio.Lock)
+
+    def start(self):
+        pass
+
+    async def request(self, frames: list, request_timeout: float) -> list:
+        self.socket.write(frames)
+        try:
+            return await asyncio.wait_for(self.socket.read(), request_timeout)
+        except aiozmq.ZmqStreamClosed:
+            # Closed under us, fail the same way a closed DealerChannel does
+            raise ConnectionError(f"Connection to {self.router_address} closed")
+
+    def close(self):
+        self.socket.close()
+
+
+@define
+class ConnectionPool:
+    # Long lived REQ or DEALER connections to peers, keyed by router address.
+    # Peers can also be addressed by ECDSA id once register() has been told
+    # which address they're on. Idle connections are heartbeated and broken
+    # ones are replaced in the background.
+    transport_mode: str = field(validator=[validators.in_(["req", "dealer"])])
+    request_timeout: float = field()
+    heartbeat_interval: float = field(default=10)
+    heartbeat_timeout: float = field(default=5)
+    on_rtt: Optional[Callable] = field(default=None)  # on_rtt(peer id or address, seconds)
+    on_lock_wait: Optional[Callable] = field(default=None)  # on_lock_wait(seconds waiting for a REQ channel's lock)
+    stream_factory: Callable = field(default=create_stream)
+    logger = field(default=None)
+
+    channels: dict[str, Union[ReqChannel, DealerChannel]] = field(factory=dict)
+    addresses: dict[str, str] = field(factory=dict)  # ecdsa id -> router address
+    peer_ids: dict[str, str] = field(factory=dict)  # router address -> ecdsa id
+    opening: dict[str, asyncio.Task] = field(factory=dict)  # address -> task opening it
+    last_reply: dict[str, float] = field(factory=dict)  # address -> monotonic time
+    heartbeat_task: asyncio.Task = field(default=None)
+    replaced: int = field(default=0)
+
+    def start(self):
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+
+    def close(self):
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+
+        for task in self.opening.values():
+            task.cancel()
+
+        for channel in self.channels.values():
+            channel.close()
+        self.channels.clear()
+
+    def register(self, ecdsa_id: str, address: str):
+        self.addresses[ecdsa_id] = address
+        self.peer_ids[address] = ecdsa_id
+
+    def address_for(self, key: str) -> str:
+        return self.addresses.get(key, key)
+
+    async def connect(self, key: str):
+        address = self.address_for(key)
+
+        channel = self.channels.get(address)
+        if channel is not None:
+            return channel
+
+        # Callers racing to open the same peer share one attempt
+        task = self.opening.get(address)
+        if task is None:
+            task = asyncio.create_task(self.open(address))
+            self.opening[address] = task
+            task.add_done_callback(lambda _: self.opening.pop(address, None))
+
+        return await asyncio.shield(task)
+
+    async def open(self, address: str):
+        socket_type = zmq.DEALER if self.transport_mode == "dealer" else zmq.REQ
+        socket = await self.stream_factory(socket_type, connect=address)
+
+        if self.transport_mode == "dealer":
+            channel = DealerChannel(address, self.peer_ids.get(address, ""), socket)
+        else:
+            channel = ReqChannel(address, socket)
+
+        channel.start()
+        self.channels[address] = channel
+        self.last_reply[address] = time.monotonic()
+
+        if self.logger is not None:
+            self.logger.info(f"Opened {self.transport_mode} connection to {address}")
+
+        return channel
+
+    def discard(self, address: str, channel):
+        # Swap a broken channel for a fresh one without making the caller wait
+        if self.channels.get(address) is channel:
+            del self.channels[address]
+            self.replaced += 1
+            asyncio.create_task(self.connect(address))
+
+        channel.close()
+
+    async def request(
+        self, key: str, frames: list, request_timeout: Optional[float] = None
+    ) -> list:
+        address = self.address_for(key)
+        request_timeout = request_timeout or self.request_timeout
+        channel = await self.connect(address)
+
+        if isinstance(channel, DealerChannel):
+            started = time.monotonic()
+            reply = await self.request_on(address, channel, frames, request_timeout)
+        else:
+            # Only requests to the same peer wait on each other, a dead peer
+            # doesn't hold up the rest
+            waiting = time.monotonic()
+            async with channel.lock:
+                started = time.monotonic()
+                if self.on_lock_wait is not None:
+                    self.on_lock_wait(started - waiting)
+                reply = await self.request_on(address, channel, frames, request_timeout)
+
+        self.last_reply[address] = time.monotonic()
+        if self.on_rtt is not None:
+            self.on_rtt(self.peer_ids.get(address, key), self.last_reply[address] - started)
+
+        return reply
+
+    async def request_on(
+        self, address: str, channel, frames: list, request_timeout: float
+    ) -> list:
+        try:
+            return await channel.request(frames, request_timeout)
+        except asyncio.TimeoutError:
+            # A REQ socket is stuck once a reply goes missing, DEALERs carry on
+            if isinstance(channel, ReqChannel):
+                self.discard(address, channel)
+            raise
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+
+            now = time.monotonic()
+            idle = [
+                address
+                for address in list(self.channels)
+                if now - self.last_reply.get(address, 0) >= self.heartbeat_interval
+            ]
+
+            await asyncio.gather(*[self.ping(address) for address in idle])
+
+    async def ping(self, address: str):
+        channel = self.channels.get(address)
+        if channel is None:
+            return
+
+        try:
+            await self.request(address, [HEARTBEAT], self.heartbeat_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            if self.logger is not None:
+                self.logger.warning(f"Heartbeat to {address} failed, reconnecting")
+
+            self.discard(address, channel)
@@ -0,0 +1,331 @@
+from attrs import frozen
+from collections import Counter
+from functools import lru_cache
+from fastecdsa import curve, ecdsa, keys, point
+from fastecdsa.ecdsa import EcdsaError
+from py_ecc.bls import G2ProofOfPossession as bls_pop
+from py_ecc.bls.ciphersuites import (
+    FQ12,
+    G1,
+    ValidationError,
+    G2_to_signature,
+    Z2,
+    add,
+    final_exponentiate,
+    hash_to_G2,
+    multiply,
+    neg,
+    pairing,
+    pubkey_to_G1,
+    signature_to_G2,
+    subgroup_check,
+)
+import hashlib
+import secrets
+
+# Optional, faster backends. Providers that need one of these raise
+# ImportError when they're created without it.
+try:
+    import nacl.signing
+    import nacl.exceptions
+except ImportError:
+    nacl = None
+
+try:
+    from Crypto.Signature import eddsa
+except ImportError:
+    eddsa = None
+
+try:
+    import blst
+except ImportError:
+    blst = None
+
+PEER_ID_LENGTH = 16  # hex characters, 64 bits of the key's digest
+KEY_VALUE_LIMIT = 1 << 256  # public_key_id packs each key value into 32 bytes
+ED25519_Y_MASK = (1 << 255) - 1
+SIGNATURE_VALUE_SIZE = 32  # bytes in each half of an Ed25519 signature
+
+# What fastecdsa raises for a signature value out of range or a key off the curve
+P256_ERRORS = (EcdsaError, ValueError, TypeError)
+
+# What each Ed25519 library raises for a bad key or signature
+ED25519_ERRORS = (ValueError, OverflowError) + (
+    (nacl.exceptions.CryptoError,) if nacl is not None else ()
+)
+
+
+# Per hop signatures. Public keys and signatures are always a pair of ints,
+# so they fit the (x, y) / (r, s) fields the wire formats already carry.
+
+
+@frozen
+class P256Signatures:
+    # ECDSA over P256 and SHA256 with fastecdsa. Keys are (x, y), signatures (r, s).
+    name = "p256"
+
+    def generate_keys(self) -> tuple:
+        private_key = keys.gen_private_key(curve.P256)
+        public_key = keys.get_public_key(private_key, curve.P256)
+        return private_key, (public_key.x, public_key.y)
+
+    def sign(self, message: bytes, private_key: int) -> tuple:
+        return ecdsa.sign(message, private_key)
+
+    def verify(self, signature: tuple, message: bytes, public_key: tuple) -> bool:
+        try:
+            return ecdsa.verify(
+                signature, message, point.Point(public_key[0], public_key[1])
+            )
+        except P256_ERRORS:
+            return False
+
+
+def is_key_pair(value: tuple) -> bool:
+    # Whether value is a public key public_key_id can hash
+    return len(value) == 2 and all(
+        isinstance(x, int) and 0 <= x < KEY_VALUE_LIMIT for x in value
+    )
+
+
+@lru_cache(maxsize=4096)
+def public_key_id(public_key: tuple) -> str:
+    # Peer id: sha256 over the key's values as 32 byte big endian ints, so it
+    # doesn't depend on the scheme or on PYTHONHASHSEED
+    encoded = b"".join(value.to_bytes(32, "big") for value in public_key)
+    return hashlib.sha256(encoded).hexdigest()[:PEER_ID_LENGTH]
+
+
+def ed25519_public_key_to_tuple(encoded: bytes) -> tuple:
+    # An encoded key is y with the parity of x in the top bit, see RFC 8032
+    value = int.from_bytes(encoded, "little")
+    return value & ED25519_Y_MASK, value >> 255
+
+
+def ed25519_public_key_to_bytes(public_key: tuple) -> bytes:
+    return ((public_key[1] << 255) | public_key[0]).to_bytes(32, "little")
+
+
+def ed25519_signature_to_tuple(signature: bytes) -> tuple:
+    return (
+        int.from_bytes(signature[:SIGNATURE_VALUE_SIZE], "big"),
+        int.from_bytes(signature[SIGNATURE_VALUE_SIZE:], "big"),
+    )
+
+
+def ed25519_signature_to_bytes(signature: tuple) -> bytes:
+    return signature[0].to_bytes(SIGNATURE_VALUE_SIZE, "big") + signature[1].to_bytes(
+        SIGNATURE_VALUE_SIZE, "big"
+    )
+
+
+@lru_cache(maxsize=16)
+def ed25519_signer(private_key: int):
+    seed = private_key.to_bytes(32, "big")
+    if nacl is not None:
+        return nacl.signing.SigningKey(seed)
+
+    return eddsa.new(eddsa.import_private_key(seed), "rfc8032")
+
+
+@lru_cache(maxsize=4096)
+def ed25519_verifier(public_key: tuple):
+    # Decoding a key costs about as much as a verification, peers reuse theirs
+    encoded = ed25519_public_key_to_bytes(public_key)
+    if nacl is not None:
+        return nacl.signing.VerifyKey(encoded)
+
+    return eddsa.new(eddsa.import_public_key(encoded), "rfc8032")
+
+
+@frozen
+class Ed25519Signatures:
+    # Ed25519 with PyNaCl (libsodium), or pycryptodome without it. The private
+    # key is the 32 byte seed as an int, the public key (y, parity of x).
+    name = "ed25519"
+
+    def __attrs_post_init__(self):
+        if nacl is None and eddsa is None:
+            raise ImportError("ed25519 signatures need PyNaCl or pycryptodome")
+
+    def generate_keys(self) -> tuple:
+        seed = secrets.token_bytes(32)
+
+        if nacl is not None:
+            encoded = nacl.signing.SigningKey(seed).verify_key.encode()
+        else:
+            encoded = eddsa.import_private_key(seed).public_key().export_key(format="raw")
+
+        return int.from_bytes(seed, "big"), ed25519_public_key_to_tuple(encoded)
+
+    def sign(self, message: bytes, private_key: int) -> tuple:
+        signer = ed25519_signer(private_key)
+
+        if nacl is not None:
+            signature = signer.sign(message).signature
+        else:
+            signature = signer.sign(message)
+
+        return ed25519_signature_to_tuple(signature)
+
+    def verify(self, signature: tuple, message: bytes, public_key: tuple) -> bool:
+        try:
+            verifier = ed25519_verifier(tuple(public_key))
+            verifier.verify(message, ed25519_signature_to_bytes(signature))
+        except ED25519_ERRORS:
+            return False
+
+        return True
+
+
+# BLS aggregate signatures over a batch of messages from one signer. Keys and
+# signatures use the standard compressed encodings, so every backend can
+# check the others' signatures.
+
+
+@lru_cache(maxsize=1024)
+def decode_public_key(public_key: bytes):
+    # The G1 point for a public key, or None if it isn't a valid key. Every
+    # batch from a creator carries the same key, so each worker only
+    # decompresses and subgroup checks it once.
+    if not bls_pop.KeyValidate(public_key):
+        return None
+
+    return pubkey_to_G1(public_key)
+
+
+def hash_messages(messages: list):
+    # Sum of the messages' points on G2. Hashing to G2 is the slow part, so
+    # a repeated message is hashed once and its point multiplied by the count.
+    total = Z2
+    for message, count in Counter(messages).items():
+        message_point = hash_to_G2(message, bls_pop.DST, bls_pop.xmd_hash_function)
+        if count > 1:
+            message_point = multiply(message_point, count)
+        total = add(total, message_point)
+    return total
+
+
+@frozen
+class PyEccBls:
+    # Pure Python, the reference implementation
+    name = "py_ecc"
+
+    def generate_keys(self) -> tuple:
+        private_key = secrets.randbits(128)
+        return private_key, bls_pop.SkToPk(private_key)
+
+    def sign_batch(self, private_key: int, messages: list) -> bytes:
+        # Same as Aggregate([Sign(sk, m) for m in messages]),
+        # sk * H(m1) + sk * H(m2) + ... == sk * (H(m1) + H(m2) + ...), so it costs
+        # one scalar multiplication instead of one per message.
+        return G2_to_signature(multiply(hash_messages(messages), private_key))
+
+    def verify_batch(self, public_key: bytes, messages: list, signature: bytes) -> bool:
+        # AggregateVerify([pk] * n, messages, signature) for one signer,
+        # e(H(m1), pk) * e(H(m2), pk) ... == e(H(m1) + H(m2) ..., pk),
+        # so it's two pairings no matter how many messages there are.
+        if not messages:
+            return False
+
+        public_key_point = decode_public_key(public_key)
+        if public_key_point is None:
+            return False
+
+        try:
+            signature_point = signature_to_G2(signature)
+        except (ValidationError, ValueError, AssertionError):
+            return False
+
+        if not subgroup_check(signature_point):
+            return False
+
+        check = pairing(hash_messages(messages), public_key_point, final_exponentiate=False)
+        check *= pairing(signature_point, neg(G1), final_exponentiate=False)
+
+        return final_exponentiate(check) == FQ12.one()
+
+
+@frozen
+class BlstBls:
+    # supranational/blst's Python bindings, compiled and much faster than py_ecc
+    name = "blst"
+
+    def __attrs_post_init__(self):
+        if blst is None:
+            raise ImportError("the blst BLS backend needs blst's Python bindings")
+
+    def secret_key(self, private_key: int):
+        secret_key = blst.SecretKey()
+        secret_key.from_bendian(private_key.to_bytes(32, "big"))
+        return secret_key
+
+    def generate_keys(self) -> tuple:
+        private_key = secrets.randbits(128)
+        return private_key, blst.P1(self.secret_key(private_key)).compress()
+
+    def sign_batch(self, private_key: int, messages: list) -> bytes:
+        # Hash everything, then one scalar multiplication, like PyEccBls
+        total = blst.P2()
+        for message in messages:
+            total.add(blst.P2().hash_to(message, bls_pop.DST))
+
+        return total.sign_with(self.secret_key(private_key)).compress()
+
+    def verify_batch(self, public_key: bytes, messages: list, signature: bytes) -> bool:
+        if not messages:
+            return False
+
+        try:
+            public_key_point = blst.P1_Affine(public_key)
+            signature_point = blst.P2_Affine(signature)
+        except RuntimeError:
+            return False
+
+        if public_key_point.is_inf() or not public_key_point.in_group():
+            return False
+        if not signature_point.in_group():
+            return False
+
+        context = blst.Pairing(True, bls_pop.DST)
+        context.aggregate(public_key_point, signature_point, messages[0])
+        for message in messages[1:]:
+            context.aggregate(public_key_point, None, message)
+        context.commit()
+
+        return context.finalverify()
+
+
+DEFAULT_SIGNATURES = P256Signatures()
+
+SIGNATURE_SCHEMES = {
+    P256Signatures.name: P256Signatures,
+    Ed25519Signatures.name: Ed25519Signatures,
+}
+BLS_BACKENDS = {
+    PyEccBls.name: PyEccBls,
+    BlstBls.name: BlstBls,
+}
+
+
+@lru_cache(maxsize=None)
+def get_signature_scheme(name: str):
+    return SIGNATURE_SCHEMES[name]()
+
+
+@lru_cache(maxsize=None)
+def get_bls_backend(name: str):
+    return BLS_BACKENDS[name]()
+
+
+def available(providers: dict) -> list:
+    # Names of the providers whose libraries are installed
+    names = []
+    for name, provider in providers.items():
+        try:
+            provider()
+        except ImportError:
+            continue
+        names.append(name)
+
+    return names
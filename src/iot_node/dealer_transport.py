@@ -0,0 +1,72 @@
+from attrs import define, field, validators
+import asyncio
+import aiozmq
+import itertools
+import struct
+
+
+def encode_request_id(request_id: int) -> bytes:
+    return struct.pack(">Q", request_id)
+
+
+def decode_request_id(frame: bytes) -> int:
+    return struct.unpack(">Q", frame)[0]
+
+
+@define
+class DealerChannel:
+    # A DEALER socket to a single peer. Every request is tagged with a request id
+    # frame, the peers ROUTER echoes the envelope back, so many requests can be
+    # in flight at once and replies are matched up in the pending table.
+    router_address: str = field(validator=[validators.instance_of(str)])
+    ecdsa_id: str = field(validator=[validators.instance_of(str)])
+    socket: aiozmq.ZmqStream = field(
+        validator=[validators.instance_of(aiozmq.ZmqStream)]
+    )
+
+    # request_id -> future resolved with the reply frames
+    pending: dict[int, asyncio.Future] = field(factory=dict)
+    request_ids = field(factory=lambda: itertools.count(1))
+    reader_task: asyncio.Task = field(default=None)
+
+    def start(self):
+        self.reader_task = asyncio.create_task(self.reader())
+
+    async def reader(self):
+        while True:
+            try:
+                recv = await self.socket.read()
+            except aiozmq.ZmqStreamClosed:
+                break
+
+            # [request_id, b"", reply...]
+            if len(recv) < 3 or recv[1] != b"":
+                continue
+
+            fut = self.pending.pop(decode_request_id(recv[0]), None)
+            if fut is not None and not fut.done():
+                fut.set_result(recv[2:])
+
+    async def request(self, frames: list, request_timeout: float) -> list:
+        request_id = next(self.request_ids)
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = fut
+
+        self.socket.write([encode_request_id(request_id), b""] + frames)
+
+        try:
+            return await asyncio.wait_for(fut, request_timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    def close(self):
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+
+        # Fail in-flight requests rather than cancelling the tasks waiting on them
+        for fut in self.pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError(f"Channel to {self.router_address} closed"))
+        self.pending.clear()
+
+        self.socket.close()
@@ -0,0 +1,197 @@
+from attrs import define, field
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+import asyncio
+import json
+import time
+
+# Histogram values are whole microseconds. The first SUB_BUCKETS values get a
+# bucket each, after that every power of two is split into HALF_BUCKETS
+# buckets, so a recorded value is never more than 1 / HALF_BUCKETS off.
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS // 2
+MAX_SHIFT = 33  # values up to ~2**40us, about 12 days
+QUANTILES = [0.5, 0.9, 0.95, 0.99, 0.999]
+
+
+def bucket_index(value: int) -> int:
+    if value < SUB_BUCKETS:
+        return value
+
+    shift = min(value.bit_length() - SUB_BUCKET_BITS, MAX_SHIFT)
+    top = min(value >> shift, SUB_BUCKETS - 1)
+    return SUB_BUCKETS + (shift - 1) * HALF_BUCKETS + (top - HALF_BUCKETS)
+
+
+def bucket_value(index: int) -> int:
+    # Middle of the bucket's range
+    if index < SUB_BUCKETS:
+        return index
+
+    shift = (index - SUB_BUCKETS) // HALF_BUCKETS + 1
+    top = (index - SUB_BUCKETS) % HALF_BUCKETS + HALF_BUCKETS
+    return (top << shift) + (1 << (shift - 1))
+
+
+@define
+class LatencyHistogram:
+    # HDR style log-linear histogram of durations, recording is O(1)
+    counts: list = field(factory=lambda: [0] * (SUB_BUCKETS + MAX_SHIFT * HALF_BUCKETS))
+    count: int = field(default=0)
+    total: float = field(default=0.0)  # seconds
+    min: Optional[float] = field(default=None)
+    max: Optional[float] = field(default=None)
+
+    def record(self, seconds: float):
+        self.counts[bucket_index(max(int(seconds * 1_000_000), 0))] += 1
+        self.count += 1
+        self.total += seconds
+
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+
+        for bound, pick in (("min", min), ("max", max)):
+            values = [v for v in (getattr(self, bound), getattr(other, bound)) if v is not None]
+            setattr(self, bound, pick(values) if values else None)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        if not self.count:
+            return None
+
+        wanted = max(1, quantile * self.count)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= wanted:
+                return min(max(bucket_value(index) / 1_000_000, self.min), self.max)
+
+        return self.max
+
+    def snapshot(self) -> dict:
+        snapshot = {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+        }
+        for quantile in QUANTILES:
+            snapshot[f"p{quantile * 100:g}"] = self.percentile(quantile)
+
+        return snapshot
+
+
+@define
+class Instrumentation:
+    # Per stage timings and counters for one node. Disabled instrumentation
+    # still spawns tasks but records nothing.
+    enabled: bool = field(default=True)
+    histograms: dict[str, LatencyHistogram] = field(factory=dict)
+    counters: Counter = field(factory=Counter)
+
+    def record(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+
+        histogram.record(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def spawn(self, coro) -> asyncio.Task:
+        # asyncio.create_task that counts how many tasks each coroutine starts
+        if self.enabled:
+            self.counters["tasks_created"] += 1
+            self.counters[f"tasks_created.{coro.__qualname__}"] += 1
+
+        return asyncio.create_task(coro)
+
+    @classmethod
+    def merge(cls, instrumentations: list) -> "Instrumentation":
+        merged = cls()
+
+        for instrumentation in instrumentations:
+            merged.counters.update(instrumentation.counters)
+
+            for stage, histogram in instrumentation.histograms.items():
+                merged.histograms.setdefault(stage, LatencyHistogram()).merge(histogram)
+
+        return merged
+
+    def snapshot(self) -> dict:
+        return {
+            "stages": {
+                stage: histogram.snapshot()
+                for stage, histogram in sorted(self.histograms.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def dump(self, path: str):
+        with open(path, "w") as dump_file:
+            json.dump(self.snapshot(), dump_file, indent=2)
+
+    def scrape(self, labels: dict = None) -> str:
+        # Prometheus text exposition format
+        base = "".join(f'{key}="{value}",' for key, value in (labels or {}).items())
+        lines = ["# TYPE racer_stage_seconds summary"]
+
+        for stage, histogram in sorted(self.histograms.items()):
+            for quantile in QUANTILES:
+                lines.append(
+                    f'racer_stage_seconds{{{base}stage="{stage}",quantile="{quantile}"}} '
+                    f"{histogram.percentile(quantile)}"
+                )
+            lines.append(f'racer_stage_seconds_sum{{{base}stage="{stage}"}} {histogram.total}')
+            lines.append(f'racer_stage_seconds_count{{{base}stage="{stage}"}} {histogram.count}')
+
+        lines.append("# TYPE racer_events_total counter")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'racer_events_total{{{base}event="{name}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+async def serve_metrics(
+    instrumentation: Instrumentation, port: int, labels: dict = None
+) -> asyncio.AbstractServer:
+    # Minimal HTTP endpoint that answers every request with scrape()
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+
+        body = instrumentation.scrape(labels).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "0.0.0.0", port)
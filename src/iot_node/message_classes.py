@@ -1,9 +1,13 @@
 from attrs import frozen, field, validators, asdict, define
-from py_ecc.bls import G2ProofOfPossession as bls_pop
-from fastecdsa import ecdsa, point
-from typing import Union, Tuple
+from fastecdsa import point
+from typing import Union, Tuple, Optional
+from functools import cached_property
 import json
 import base64
+import hashlib
+
+from .crypto import DEFAULT_SIGNATURES
+from .crypto import is_key_pair
 
 
 def bytes_to_base64(x: bytes):
@@ -13,6 +17,22 @@ def bytes_to_base64(x: bytes):
         return base64.b64decode(x)
 
 
+def key_pair(instance, attribute, value):
+    # Peer ids are worked out from keys before their signatures are checked,
+    # so a key public_key_id can't hash makes the whole message malformed
+    if not is_key_pair(value):
+        raise ValueError(f"{attribute.name} must be a pair of ints in [0, 2**256)")
+
+
+def clock_entries(instance, attribute, value):
+    # (peer id, count) pairs, the batch's hash sums the counts
+    if not all(
+        len(entry) == 2 and isinstance(entry[0], str) and isinstance(entry[1], int)
+        for entry in value
+    ):
+        raise ValueError(f"{attribute.name} must be (peer id, count) pairs")
+
+
 @frozen
 class PublishMessage:
     message_type: str = field(validator=[validators.instance_of(str)])
@@ -27,9 +47,10 @@ class DirectMessage:
 @frozen
 class PeerDiscovery(DirectMessage):
     bls_public_key: str = field(converter=bytes_to_base64)
-    ecdsa_public_key: tuple = field(converter=tuple)
+    ecdsa_public_key: tuple = field(converter=tuple, validator=[key_pair])
     router_address: str = field(validator=[validators.instance_of(str)])
     publisher_address: str = field(validator=[validators.instance_of(str)])
+    codec_version: int = field(default=0, validator=[validators.instance_of(int)])
 
 
 @frozen
@@ -37,6 +58,14 @@ class Gossip(DirectMessage):
     timestamp: int = field(validator=[validators.instance_of(int)])
     padding: int = field(validator=[validators.instance_of(int)])
 
+    @cached_property
+    def digest(self) -> bytes:
+        return hashlib.sha256(json.dumps(asdict(self)).encode()).digest()
+
+    def approximate_size(self) -> int:
+        # Rough encoded size, used to decide when a batch is big enough to send
+        return len(self.message_type) + 8 + (self.padding.bit_length() + 7) // 8
+
 
 def base64_to_bytes(x: base64) -> bytes:
     return base64.b64decode(x)
@@ -48,13 +77,24 @@ def ecdsa_tuple_to_point(ecdsa_tuple: tuple) -> point.Point:
 
 # These classes are used for the AT2 protocol messages
 
+BATCH_ID_PATTERN = "[0-9a-f]{64}"  # sha256 hex digest
+
 
 @frozen
 class Echo(DirectMessage):
-    batched_messages_hash: str = field(validator=[validators.instance_of(str)])
-    creator: tuple = field(converter=tuple)  # ECDSA pubkey
-
-    def get_echo_bytes(self):
+    batched_messages_hash: str = field(
+        validator=[validators.instance_of(str), validators.matches_re(BATCH_ID_PATTERN)]
+    )  # BatchedMessages.batch_id as hex
+    creator: tuple = field(converter=tuple, validator=[key_pair])  # ECDSA pubkey
+
+    @cached_property
+    def batch_id(self) -> bytes:
+        return bytes.fromhex(self.batched_messages_hash)
+
+    # Frozen, so the signed bytes only need building once. attrs keeps
+    # cached_property values in slots, out of eq, repr and asdict.
+    @cached_property
+    def echo_bytes(self) -> bytes:
         message_bytes = (
             self.batched_messages_hash
             + str(self.message_type)
@@ -64,16 +104,19 @@ class Echo(DirectMessage):
 
         return message_bytes.encode()
 
+    def get_echo_bytes(self):
+        return self.echo_bytes
+
     def sign_message(self, keys):
         # The sender part is signed with the ECDSA private key
 
-        return ecdsa.sign(self.get_echo_bytes(), keys.ecdsa_private_key)
+        return keys.signatures.sign(self.get_echo_bytes(), keys.ecdsa_private_key)
 
-    def verify_message(self, signature: tuple):
-        creator_sig_check = ecdsa.verify(
+    def verify_message(self, signature: tuple, signatures=DEFAULT_SIGNATURES):
+        creator_sig_check = signatures.verify(
             signature,
             self.get_echo_bytes(),
-            ecdsa_tuple_to_point(self.creator),
+            self.creator,
         )
 
         return creator_sig_check
@@ -81,9 +124,18 @@ class Echo(DirectMessage):
 
 @frozen
 class Response(PublishMessage):
-    creator: tuple = field(converter=tuple)  # ECDSA pubkey
-
-    def get_echo_bytes(self) -> bytes:
+    creator: tuple = field(converter=tuple, validator=[key_pair])  # ECDSA pubkey
+
+    @cached_property
+    def batch_id(self) -> Optional[bytes]:
+        # The topic is a batch id as hex, None if a peer sent something else
+        try:
+            return bytes.fromhex(self.topic)
+        except ValueError:
+            return None
+
+    @cached_property
+    def echo_bytes(self) -> bytes:
         message_bytes = (
             str(self.topic)
             + str(self.message_type)
@@ -93,21 +145,47 @@ class Response(PublishMessage):
 
         return message_bytes.encode()
 
+    def get_echo_bytes(self) -> bytes:
+        return self.echo_bytes
+
     def sign(self, keys) -> tuple:
         # The sender part is signed with the ECDSA private key
 
-        return ecdsa.sign(self.get_echo_bytes(), keys.ecdsa_private_key)
+        return keys.signatures.sign(self.get_echo_bytes(), keys.ecdsa_private_key)
 
-    def verify_echo_response(self, signature: tuple):
-        creator_sig_check = ecdsa.verify(
+    def verify_echo_response(self, signature: tuple, signatures=DEFAULT_SIGNATURES):
+        creator_sig_check = signatures.verify(
             signature,
             self.get_echo_bytes(),
-            ecdsa_tuple_to_point(self.creator),
+            self.creator,
         )
 
         return creator_sig_check
 
 
+def response_batch_bytes(frames: list) -> bytes:
+    # Length prefixed, so the frame boundaries are covered by the signature too
+    return b"".join([len(frame).to_bytes(4, "big") + frame for frame in frames])
+
+
+def sign_response_batch(frames: list, keys) -> tuple:
+    # One signature over every response frame in a publish
+    return keys.signatures.sign(response_batch_bytes(frames), keys.ecdsa_private_key)
+
+
+def verify_response_batch(
+    frames: list, signature: tuple, creator: tuple, signatures=DEFAULT_SIGNATURES
+) -> bool:
+    return signatures.verify(
+        signature,
+        response_batch_bytes(frames),
+        creator,
+    )
+
+
+UNSIGNED_BLS_SIGNATURE = "111"  # aggregated_bls_signature of batches built with BLS off
+
+
 @frozen
 class BatchedMessages:
     message_type: str = field(validator=[validators.instance_of(str)])
@@ -115,8 +193,8 @@ class BatchedMessages:
         validator=[validators.instance_of(str)]
     )  # BLS pubkey, bytes encoded in base64
 
-    creator_ecdsa: tuple = field(converter=tuple)
-    sender_ecdsa: tuple = field(converter=tuple)
+    creator_ecdsa: tuple = field(converter=tuple, validator=[key_pair])
+    sender_ecdsa: tuple = field(converter=tuple, validator=[key_pair])
 
     messages: Union[Tuple[DirectMessage], Tuple[dict]] = field(converter=tuple)
     aggregated_bls_signature: str = field(
@@ -124,83 +202,103 @@ class BatchedMessages:
     )  # bytes encoded as base64
 
     merkle_root: str = field(validator=[validators.instance_of(str)])
-    vector_clock: tuple = field(converter=tuple)
-
-    def __hash__(self):
-        return hash(self.get_creator_bytes())
-
-    def get_creator_bytes(self) -> bytes:
-        creator_bytes = (
+    vector_clock: tuple = field(converter=tuple, validator=[clock_entries])
+
+    # The signed bytes and hash are built on first use and cached, see Echo.
+    # The sender bytes are the creator bytes with the sender's key in the
+    # middle, so both are put together from the same two halves.
+    @cached_property
+    def creator_head(self) -> bytes:
+        creator_head = (
             self.message_type
             + self.creator_bls
             + str(self.creator_ecdsa[0])
             + str(self.creator_ecdsa[1])
-            + self.aggregated_bls_signature
-            + self.merkle_root
-            + str(sum(value for key, value in self.vector_clock))
         )
 
-        return creator_bytes.encode()
+        return creator_head.encode()
 
-    def get_sender_bytes(self) -> bytes:
-        sender_bytes = (
-            self.message_type
-            + self.creator_bls
-            + str(self.creator_ecdsa[0])
-            + str(self.creator_ecdsa[1])
-            + str(self.sender_ecdsa[0])
-            + str(self.sender_ecdsa[1])
-            + self.aggregated_bls_signature
+    @cached_property
+    def creator_tail(self) -> bytes:
+        creator_tail = (
+            self.aggregated_bls_signature
             + self.merkle_root
             + str(sum(value for key, value in self.vector_clock))
         )
 
-        return sender_bytes.encode()
+        return creator_tail.encode()
+
+    @cached_property
+    def creator_bytes(self) -> bytes:
+        return self.creator_head + self.creator_tail
+
+    @cached_property
+    def sender_bytes(self) -> bytes:
+        sender = str(self.sender_ecdsa[0]) + str(self.sender_ecdsa[1])
+        return self.creator_head + sender.encode() + self.creator_tail
+
+    @cached_property
+    def creator_hash(self) -> int:
+        return hash(self.creator_bytes)
+
+    @cached_property
+    def batch_id(self) -> bytes:
+        # Content address of the batch, the same in every process. Peers see
+        # it as hex in Echo.batched_messages_hash and Response.topic.
+        return hashlib.sha256(self.creator_bytes).digest()
+
+    def __hash__(self):
+        return self.creator_hash
+
+    def get_creator_bytes(self) -> bytes:
+        return self.creator_bytes
+
+    def get_sender_bytes(self) -> bytes:
+        return self.sender_bytes
 
     def sign_as_creator(self, keys) -> tuple:
         # Here we sign the whole message, but don't sign the sender part
 
-        return ecdsa.sign(self.get_creator_bytes(), keys.ecdsa_private_key)
+        return keys.signatures.sign(self.get_creator_bytes(), keys.ecdsa_private_key)
 
     def sign_as_sender(self, keys):
         # Here we sign the whole message and include the sender ecdsa
         # Most of the time the sender won't be the original message creator
 
-        return ecdsa.sign(self.get_sender_bytes(), keys.ecdsa_private_key)
+        return keys.signatures.sign(self.get_sender_bytes(), keys.ecdsa_private_key)
 
     def verify_creator_and_sender(
-        self, signature: tuple, signature_to_check: str
+        self, signature: tuple, signature_to_check: str, signatures=DEFAULT_SIGNATURES
     ) -> bool:
         assert signature_to_check in {
             "creator",
             "sender",
         }, "Invalid signature_to_check value"
 
-        sig_check = ecdsa.verify(
+        # The creator part is only ever signed by the creator, gossipers pass
+        # the original signature along and sign the sender part themselves
+        sig_check = signatures.verify(
             signature,
             (
                 self.get_creator_bytes()
                 if signature_to_check == "creator"
                 else self.get_sender_bytes()
             ),
-            ecdsa_tuple_to_point(self.sender_ecdsa),
+            (
+                self.creator_ecdsa
+                if signature_to_check == "creator"
+                else self.sender_ecdsa
+            ),
         )
 
         return sig_check
 
-    def verify_aggregated_bls_signature(self) -> bool:
-        creator_bls_decoded = base64.b64decode(self.creator_bls)
-        pub_keys = [creator_bls_decoded for _ in self.messages]
-        messages_as_bytes = [json.dumps(asdict(x)).encode() for x in self.messages]
-
-        aggregated_bls_check = bls_pop.AggregateVerify(
-            pub_keys, messages_as_bytes, base64.b64decode(self.aggregated_bls_signature)
-        )
-
-        return aggregated_bls_check
+    def bls_message_bytes(self) -> list:
+        # What the creator's aggregated BLS signature covers, one entry per message
+        return [json.dumps(asdict(x)).encode() for x in self.messages]
 
     def become_sender(self, keys):
-        return BatchedMessages(
+        bm = BatchedMessages(
             message_type=self.message_type,
             creator_bls=self.creator_bls,
             creator_ecdsa=self.creator_ecdsa,
@@ -210,3 +308,15 @@ class BatchedMessages:
             merkle_root=self.merkle_root,
             vector_clock=self.vector_clock,
         )
+
+        # Only the sender changed, the creator part and hash carry over
+        for name in (
+            "creator_head",
+            "creator_tail",
+            "creator_bytes",
+            "creator_hash",
+            "batch_id",
+        ):
+            object.__setattr__(bm, name, getattr(self, name))
+
+        return bm
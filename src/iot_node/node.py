@@ -1,24 +1,21 @@
-from attrs import define, field, asdict, frozen, validators
-from py_ecc.bls import G2ProofOfPossession as bls_pop
-from fastecdsa import curve, keys, point
+from attrs import define, field, asdict, frozen, validators, evolve
+from fastecdsa import point
 from merkly.mtree import MerkleTree
 from collections import defaultdict
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from talipp.indicators import ZLEMA, RSI, SMA, EMA, KAMA, TEMA, TSI
-from scipy.stats import poisson, norm
-from typing import Union
 from sortedcontainers import SortedSet
 from collections import deque
-from async_timeout import timeout
+from typing import Callable
+from functools import partial
 import base64
 import asyncio
 import aiozmq
 import zmq
 import json
-import secrets
 import random
 import time
-import math
+import sys
+import psutil
 
 from .message_classes import DirectMessage
 from .message_classes import PublishMessage
@@ -27,31 +24,57 @@ from .message_classes import Gossip
 from .message_classes import PeerDiscovery
 from .message_classes import Echo
 from .message_classes import Response
+from .message_classes import sign_response_batch
+from .message_classes import UNSIGNED_BLS_SIGNATURE
+from .message_classes import verify_response_batch
+from .connection_pool import ConnectionPool
+from .connection_pool import create_stream
+from .instrumentation import Instrumentation
+from .instrumentation import serve_metrics
+from .codec import CODECS
+from .codec import DECODE_ERRORS
+from .codec import codec_for_frame
+from .codec import negotiate_codec
+from .codec import topic_prefix
+from .codec import strip_topic_prefix
+from .verification import VerificationPipeline
+from .bls_service import BlsService
+from .crypto import BLS_BACKENDS
+from .crypto import DEFAULT_SIGNATURES
+from .crypto import SIGNATURE_SCHEMES
+from .crypto import get_bls_backend
+from .crypto import get_signature_scheme
+from .crypto import public_key_id
+from .signature_cache import VerifiedSignatureCache
+from .quorum import QuorumTracker
+from .retention import StateRetention
+from .plato import PlatoEstimator
+from .batching import AdaptiveFlushScheduler
+from .sampling import PeerSampler
 from .commad_arg_classes import SubscribeToPublisher
 from .commad_arg_classes import UnsubscribeFromTopic
 from .at2_classes import AT2Configuration
-from .kalman import kalman_filter
 from logs import get_logger
 
 
 @frozen
 class CryptoKeys:
+    # The ecdsa_* keys sign every hop, with whichever scheme `signatures` is
     ecdsa_private_key: int = field(validator=[validators.instance_of(int)])
-    ecdsa_public_key: point.Point = field(
-        validator=[validators.instance_of(point.Point)]
-    )
     ecdsa_public_key_tuple: tuple = field(validator=[validators.instance_of(tuple)])
 
     bls_private_key: int = field(validator=[validators.instance_of(int)])
     bls_public_key: bytes = field(validator=[validators.instance_of(bytes)])
     bls_public_key_string: str = field(validator=[validators.instance_of(str)])
 
+    signatures = field(default=DEFAULT_SIGNATURES)  # see crypto.py
+
     def ecdsa_tuple_to_point(self, ecdsa_tuple: tuple) -> point.Point:
         return point.Point(ecdsa_tuple[0], ecdsa_tuple[1])
 
     def ecdsa_tuple_to_id(self, ecdsa: tuple) -> str:
         assert isinstance(ecdsa, tuple)
-        return str(hash(ecdsa))[:10]
+        return public_key_id(ecdsa)
 
     def bls_bytes_to_base64(self, bls_bytes: bytes) -> base64:
         base64.b64encode(bls_bytes).decode("utf-8")
@@ -70,15 +93,6 @@ class PeerInformation:
     publisher_address: str = field(validator=[validators.instance_of(str)])
 
 
-@define
-class PeerSocket:
-    router_address: str = field(validator=[validators.instance_of(str)])
-    ecdsa_id: str = field(validator=[validators.instance_of(str)])
-    socket: aiozmq.ZmqStream = field(
-        validator=[validators.instance_of(aiozmq.ZmqStream)]
-    )
-
-
 @define
 class Node:
     router_bind: str = field(validator=[validators.instance_of(str)])
@@ -91,7 +105,12 @@ class Node:
 
     # Info about our peers
     peers: dict[str, PeerInformation] = field(factory=dict)  # str == ECDSA ID
-    sockets: dict[str, PeerSocket] = field(factory=dict)  # str == ECDSA ID
+    pool: ConnectionPool = field(init=False)  # connections to peers, by ECDSA id or router address
+    discovery_concurrency = 32  # peer discovery requests in flight at once
+    discovery_retry_interval = 0.5  # seconds between rounds until cluster_ready
+    discovery_timeout = 60  # seconds of rounds before giving up on expected_peers
+    expected_peers: int = field(default=None)  # cluster_ready is set once we know this many peers
+    cluster_ready: asyncio.Event = field(factory=asyncio.Event)
 
     # AIOZMQ Sockets
     _subscriber: aiozmq.stream.ZmqStream = field(init=False)
@@ -99,10 +118,15 @@ class Node:
     _router: aiozmq.stream.ZmqStream = field(init=False)
     connected_subscribers: set = field(factory=set)  # stores peer_ids
     subscribed_topics: set = field(factory=set)  # stores topics as bytes
-    rep_lock = field(factory=lambda: asyncio.Lock())
+    subscription_mode: str = field(
+        default="all", validator=[validators.in_(["all", "topic"])]
+    )  # 'topic' subscribes per (topic, peer) so publishers only send us responses we asked for
+    topic_subscriptions: dict[str, set] = field(factory=dict)  # topic -> peer_ids subscribed to
+    stream_factory: Callable = field(default=create_stream)  # makes every socket, see simulation.py
 
     _crypto_keys: CryptoKeys = field(init=False)
     running: bool = field(factory=bool)
+    listeners: list = field(factory=list)  # router and subscriber listener tasks
 
     # Tuneable Values
     target_latency: int = 2.5  # target latency for data messages. PLATO attempts to keep latency around this value.
@@ -110,33 +134,83 @@ class Node:
     max_publishing_frequency = 10  # maximum publishing frequency in seconds
     minimum_latency: int = 1  # minimum latency in seconds for data messages
     max_gossip_timeout_time = 60  # how long before a gossip is terminated? Failed Gossip recalling and re-broadcasting not implemented.
-    node_selection_type = "normal"  # can choose 'poisson' 'normal' or 'random'
+    node_selection_type = "normal"  # can choose 'poisson' 'normal' 'random' or 'latency'
+    sampler: PeerSampler = field(factory=PeerSampler)  # cached peer ids for select_nodes
+    transport_mode: str = field(
+        default="req", validator=[validators.in_(["req", "dealer"])]
+    )  # 'req' sends one request at a time to each peer, 'dealer' pipelines requests over per-peer DEALER sockets
+    request_timeout: int = 30  # seconds before an unanswered request is dropped
+    heartbeat_interval = 10  # idle peer connections are pinged this often
+    heartbeat_timeout = 5  # a peer that doesn't answer a ping in time gets a fresh socket
+    wire_codec: str = field(
+        default="json", validator=[validators.in_(list(CODECS))]
+    )  # 'json' or 'binary', peers fall back to the newest codec both sides support
+    codec = field(init=False)
+    verification_mode: str = field(
+        default="inline", validator=[validators.in_(["inline", "pipeline"])]
+    )  # 'pipeline' replies to the sender straight away and checks signatures in batches on a process pool
+    verification_workers = 2  # processes used by the verification pipeline
+    verification_batch_window = 0.005  # seconds the pipeline waits to fill a batch
+    verification_max_batch = 64  # maximum BatchedMessages verified per batch
+    verifier: VerificationPipeline = field(init=False)
+    verified_signature_cache_size = 10000  # creator signatures remembered so regossiped copies skip verification
+    verified_creators: VerifiedSignatureCache = field(init=False)
+    publish_signature_mode: str = field(
+        default="per_response",
+        validator=[validators.in_(["per_response", "aggregate"])],
+    )  # 'aggregate' signs each publish once instead of signing every response in it
+    bls_enabled: bool = field(
+        default=False, validator=[validators.instance_of(bool)]
+    )  # sign batches with BLS and check the aggregate before accepting them, every node in a cluster needs the same setting
+    signature_scheme: str = field(
+        default="p256", validator=[validators.in_(list(SIGNATURE_SCHEMES))]
+    )  # per hop signatures, 'ed25519' needs PyNaCl or pycryptodome. Every node in a cluster needs the same scheme
+    bls_backend: str = field(
+        default="py_ecc", validator=[validators.in_(list(BLS_BACKENDS))]
+    )  # 'blst' needs blst's Python bindings
+    bls_workers = 2  # processes signing and verifying BLS aggregates
+    bls_max_pending = 256  # BLS jobs queued before callers wait
+    max_bls_batch_gossips = 16  # py_ecc hashes about 8 messages a second, keeps signing and checking a batch to a few seconds
+    bls: BlsService = field(default=None)
 
     # Congestion control
     scheduler = field(init=False)
-    pending_gossips: list[Gossip] = field(factory=list)
+    pending_gossips: deque = field(factory=deque)
+    pending_space: asyncio.Event = field(factory=asyncio.Event)  # set while submit() can queue more
+    max_pending_gossips = 5000  # submit() waits once this many gossips are queued
+    max_batch_gossips = 500  # gossips per BatchedMessage, larger backlogs are split
+    max_batch_bytes = 256_000  # approximate bytes per BatchedMessage
     pending_responses: list[Response] = field(factory=list)
-    batched_message_job_id = field(init=False)
+    batch_scheduler: AdaptiveFlushScheduler = field(init=False)
+    batch_flush_count = 1000  # build a batch early once this many gossips are pending
+    batch_flush_bytes = 1_000_000  # or once the pending gossips reach this many bytes
     increase_job_id = field(init=False)
     decrease_job_id = field(init=False)
     publish_pending_frequency: int = field(factory=int)
-    publish_pending_responses_job_id = field(init=False)
-    job_time_change_flag: bool = field(factory=bool)
-    publish_pending_change_flag: bool = field(factory=bool)
+    publish_scheduler: AdaptiveFlushScheduler = field(init=False)
+    publish_flush_count = 1000  # publish early once this many responses are pending
     current_latency: int = field(factory=int)
     peers_latency: deque = field(factory=lambda: deque(maxlen=100))
     our_latency: deque = field(factory=lambda: deque(maxlen=100))
+    plato: PlatoEstimator = field(factory=PlatoEstimator)  # smoothed latency and RSI, updated per sample
     recently_missed_delivery: defaultdict[bool] = field(
         factory=lambda: defaultdict(bool)
     )
 
     # SBRB Specific Variables #
-    received_messages: dict[str, BatchedMessages] = field(factory=dict)
-    already_received: defaultdict[str, set] = field(factory=lambda: defaultdict(set))
+    # bytes == BatchedMessages.batch_id
+    received_messages: dict[bytes, BatchedMessages] = field(factory=dict)
+    creator_signatures: dict[bytes, tuple] = field(factory=dict)
+    already_received: defaultdict[bytes, set] = field(factory=lambda: defaultdict(set))
+
+    # Echo and ready replies from the peers we sampled, per batch_id
+    quorum_trackers: dict[bytes, QuorumTracker] = field(factory=dict)
 
-    # str == msg_hash, set() of peer_ids
-    echo_replies: defaultdict[str, set] = field(factory=lambda: defaultdict(set))
-    ready_replies: defaultdict[str, set] = field(factory=lambda: defaultdict(set))
+    # Per batch_id state is dropped this long after its gossip finishes
+    retention_time = 60
+    retention_purge_interval = 5  # seconds between purges
+    max_tombstones = 50000  # expired batch_ids we still recognise as duplicates
+    retention: StateRetention = field(init=False)
 
     # Sequencing
     # str == node_id
@@ -145,12 +219,19 @@ class Node:
 
     # Statistics
     sent_gossips: int = field(factory=int)
+    signing_batches: int = field(factory=int)  # built, still waiting for their BLS signature
     received_gossips: int = field(factory=int)
     delivered_gossips: int = field(factory=int)
     sent_msg_metadata: list = field(factory=list)
     received_msg_metadata: list = field(factory=list)
     current_latency_metadata: list = field(factory=list)
     delivered_msg_metadata: list = field(factory=list)
+    delivery_latency_metadata: list = field(factory=list)  # (time, seconds from gossiping our batch to delivering it)
+    instrumentation: Instrumentation = field(factory=Instrumentation)  # per stage timings, see statistics()
+    metrics_port: int = field(default=None)  # serve instrumentation.scrape() over HTTP on this port
+    metrics_server: asyncio.AbstractServer = field(default=None)
+    discovery_started: float = field(default=None)
+    time_to_ready: float = field(default=None)  # seconds from peer_discovery() to cluster_ready
 
     ####################
     # Inbox            #
@@ -160,26 +241,26 @@ class Node:
 
         if isinstance(message, BatchedMessages):
             self.received_gossips += 1
-            bm_hash = str(hash(message))
-            if bm_hash not in self.received_messages:
+            batch_id = message.batch_id
+            if not self.have_received(batch_id):
                 bm_creator = self._crypto_keys.ecdsa_tuple_to_id(message.creator_ecdsa)
-                self.received_messages[bm_hash] = message
+                self.received_messages[batch_id] = message
                 self.vector_clock[bm_creator] += 1
 
                 er = Response(
                     "EchoResponse",
-                    str(bm_hash),
+                    batch_id.hex(),
                     self._crypto_keys.ecdsa_public_key_tuple,
                 )
                 self.command(er)
 
                 bm = message.become_sender(self._crypto_keys)
                 # regossip the message from the original creator, now with you as sender
-                asyncio.create_task(self.gossip(bm))
+                self.spawn(self.gossip(bm))
 
         elif isinstance(message, Echo):
             if message.message_type == "EchoSubscribe":
-                if message.batched_messages_hash in self.received_messages:
+                if self.have_received(message.batch_id):
                     # publish an echo_reply for that particular message hash
                     er = Response(
                         "EchoResponse",
@@ -191,9 +272,9 @@ class Node:
                     # if you haven't received the message yet, ignore
                     pass
             if message.message_type == "ReadySubscribe":
-                if (
-                    len(self.ready_replies[message.batched_messages_hash])
-                    >= self.at2_config.feedback_threshold
+                tracker = self.quorum_trackers.get(message.batch_id)
+                if tracker is not None and tracker.ready.reached(
+                    self.at2_config.feedback_threshold
                 ):
                     ready = Response(
                         "ReadyResponse",
@@ -204,32 +285,16 @@ class Node:
         elif isinstance(message, PeerDiscovery):
             ecdsa_id = self._crypto_keys.ecdsa_tuple_to_id(message.ecdsa_public_key)
 
-            self.peers[ecdsa_id] = message
-
-            req = await aiozmq.create_zmq_stream(zmq.REQ)
-
-            attempts = 0
-            while attempts < 50:
-                try:
-                    async with timeout(1):
-                        await req.transport.connect(message.router_address)
-                        self.my_logger.info(f"Successfully added {ecdsa_id}'s socket")
-                        break
-                except asyncio.TimeoutError:
-                    self.my_logger.warning(
-                        f"Couldnt add socket for {ecdsa_id}, attempt: {attempts}"
-                    )
-                    req.close()
-                    req = await aiozmq.create_zmq_stream(zmq.REQ)
-                    attempts += 1
-                    await asyncio.sleep(1)
+            if ecdsa_id not in self.peers:
+                self.peers[ecdsa_id] = message
+                self.sampler.set_peers(self.peers)
             else:
-                self.my_logger.error(
-                    f"Failed to add socket for {ecdsa_id} after {attempts} attempts"
-                )
+                self.peers[ecdsa_id] = message
 
-            self.sockets[ecdsa_id] = PeerSocket(message.router_address, ecdsa_id, req)
+            self.pool.register(ecdsa_id, message.router_address)
+            await self.pool.connect(ecdsa_id)
             self.recently_missed_delivery[ecdsa_id] = False
+            self.check_cluster_ready()
 
         elif isinstance(message, DirectMessage):
             self.my_logger.info(message)
@@ -246,6 +311,18 @@ class Node:
 
             recv = await self._router.read()
 
+            # REQ peers send [identity, b"", ...] and DEALER peers send
+            # [identity, request_id, b"", ...]. Everything up to the first empty
+            # frame is the envelope, which is echoed back with the reply.
+            try:
+                delimiter = recv.index(b"")
+            except ValueError:
+                self.my_logger.error(f"Received message without an envelope: {recv}")
+                continue
+
+            envelope = recv[: delimiter + 1]
+            recv = recv[delimiter + 1 :]
+
             # if len(recv) == 3:
             #     self.my_logger.info("Received unsigned message")
             #     pass
@@ -256,16 +333,32 @@ class Node:
             # else:
             #     self.my_logger.warning(f"Received message of unknown length! {recv}")
 
-            msg = json.loads(recv[2].decode())
             router_response = b"OK"
 
-            if msg["message_type"] == "DirectMessage":
-                dm = DirectMessage(**msg)
-                asyncio.create_task(self.inbox(dm))
-            if msg["message_type"] == "BatchedMessage":
-                msg["messages"] = tuple([Gossip(**x) for x in msg["messages"]])
-                bm = BatchedMessages(**msg)
-                bm_hash = str(hash(bm))
+            # Decode the signatures and batch id with the message, so a
+            # malformed frame from a peer is dropped here instead of killing
+            # the listener
+            try:
+                # Peers may write JSON or binary frames, depending on what we negotiated
+                codec = codec_for_frame(recv[0])
+                msg = codec.decode_message(recv[0])
+                if msg.message_type == "BatchedMessage":
+                    batch_id = msg.batch_id
+                    creator_signature = codec.decode_signature(recv[2])
+                    sender_signature = codec.decode_signature(recv[4])
+                elif msg.message_type in ["EchoSubscribe", "ReadySubscribe"]:
+                    creator_signature = codec.decode_signature(recv[2])
+            except DECODE_ERRORS as e:
+                self.my_logger.error(f"Received unrecognised message: {e!r}")
+                self._router.write(envelope + [router_response])
+                continue
+
+            if msg.message_type == "DirectMessage":
+                self.spawn(self.inbox(msg))
+            elif msg.message_type == "Heartbeat":
+                pass
+            elif msg.message_type == "BatchedMessage":
+                bm = msg
 
                 router_response = json.dumps(
                     {
@@ -273,67 +366,73 @@ class Node:
                     }
                 ).encode()
 
-                if bm_hash not in self.received_messages:
-                    creator_signature = json.loads(recv[4].decode())
-                    sender_signature = json.loads(recv[6].decode())
+                if not self.have_received(batch_id):
+                    sender_id = self._crypto_keys.ecdsa_tuple_to_id(bm.sender_ecdsa)
 
-                    creator_sig_check = bm.verify_creator_and_sender(
-                        creator_signature, "creator"
-                    )
-                    sender_sig_check = bm.verify_creator_and_sender(
-                        sender_signature, "sender"
+                    # Every gossiper forwards the same creator signature, so
+                    # only the first copy needs a curve operation
+                    creator_verified = self.verified_creators.contains(
+                        (bm.get_creator_bytes(), creator_signature)
                     )
-                    # agg_msg_sig_check = bm.verify_aggregated_bls_signature()
-                    agg_msg_sig_check = True
 
-                    # acceptable_lag = (
-                    #     True
-                    #     if bm_vector_clock_int
-                    #     >= our_vector_clock_int - self.vector_clock_lag
-                    #     else False
-                    # )
-
-                    creator_id = self._crypto_keys.ecdsa_tuple_to_id(bm.creator_ecdsa)
-                    sender_id = self._crypto_keys.ecdsa_tuple_to_id(bm.sender_ecdsa)
-
-                    if creator_sig_check and sender_sig_check and agg_msg_sig_check:
-                        self.my_logger.info(
-                            f"Received BatchedMessage {bm_hash} from: {sender_id} created by {creator_id}"
+                    if self.verification_mode == "pipeline":
+                        # Don't hold up the listener, the verifier passes the BM
+                        # to the inbox once its signatures check out and the
+                        # reply goes out after that
+                        verified = self.verifier.submit(
+                            bm, creator_signature, sender_signature, creator_verified
                         )
+                        self.spawn(
+                            self.reply_when_verified(
+                                envelope, router_response, sender_id, verified
+                            )
+                        )
+                        continue
+                    else:
+                        with self.instrumentation.timer("verify"):
+                            creator_sig_check = (
+                                creator_verified
+                                or bm.verify_creator_and_sender(
+                                    creator_signature,
+                                    "creator",
+                                    self._crypto_keys.signatures,
+                                )
+                            )
+                            sender_sig_check = bm.verify_creator_and_sender(
+                                sender_signature, "sender", self._crypto_keys.signatures
+                            )
 
-                        asyncio.create_task(self.inbox(bm))
-
-                        router_response = json.dumps(
-                            {
-                                "status": "CongestionUpdate",
-                                "current_latency": self.current_latency,
-                                "recently_missed": self.recently_missed_delivery[
-                                    sender_id
-                                ],
-                            }
-                        ).encode()
-
-                        self.recently_missed_delivery[sender_id] = False
+                        # acceptable_lag = (
+                        #     True
+                        #     if bm_vector_clock_int
+                        #     >= our_vector_clock_int - self.vector_clock_lag
+                        #     else False
+                        # )
 
-                    else:
-                        self.my_logger.error(
-                            f"Signature verification failed for {bm} | creator {creator_id} | sender {sender_id}"
-                        )
+                        if creator_sig_check and sender_sig_check:
+                            self.signatures_verified(bm, creator_signature)
+                            router_response = self.congestion_update(sender_id)
+                        else:
+                            self.reject_batched_message(bm)
                 else:
-                    self.my_logger.debug(f"Already received BM: {bm_hash}")
+                    self.my_logger.debug(f"Already received BM: {batch_id.hex()}")
 
-            elif msg["message_type"] == "PeerDiscovery":
-                pd = PeerDiscovery(**msg)
+            elif msg.message_type == "PeerDiscovery":
+                pd = msg
                 creator_id = self._crypto_keys.ecdsa_tuple_to_id(pd.ecdsa_public_key)
                 # self.my_logger.info(
                 #     f"Received Peer Discovery Message from {creator_id}"
                 # )
-                asyncio.create_task(self.inbox(pd))
-            elif msg["message_type"] in ["EchoSubscribe", "ReadySubscribe"]:
-                echo_type = msg["message_type"]
-                creator_signature = json.loads(recv[4].decode())
-                es = Echo(**msg)
-                msg_sig_check = es.verify_message(creator_signature)
+                self.spawn(self.inbox(pd))
+                # Tell the sender who else we know, so it can find the rest of the cluster
+                router_response = self.known_peers_reply()
+            elif msg.message_type in ["EchoSubscribe", "ReadySubscribe"]:
+                echo_type = msg.message_type
+                es = msg
+                with self.instrumentation.timer("verify"):
+                    msg_sig_check = es.verify_message(
+                        creator_signature, self._crypto_keys.signatures
+                    )
 
                 creator_id = self._crypto_keys.ecdsa_tuple_to_id(es.creator)
 
@@ -342,11 +441,11 @@ class Node:
                 # )
 
                 # Tells the sender not to send this BatchedMessage to us again. We already have it.
-                if es.batched_messages_hash in self.received_messages:
+                if self.have_received(es.batch_id):
                     router_response = b"ALREADY_RECEIVED"
 
                 if msg_sig_check:
-                    asyncio.create_task(self.inbox(es))
+                    self.spawn(self.inbox(es))
                 else:
                     self.my_logger.warning(
                         f"Signature verification on {echo_type} from {creator_id} failed {es}"
@@ -354,53 +453,138 @@ class Node:
             else:
                 self.my_logger.error(f"Received unrecognised message: {msg}")
 
-            self._router.write([recv[0], b"", router_response])
+            self._router.write(envelope + [router_response])
+
+    def signatures_verified(self, bm: BatchedMessages, creator_signature: tuple):
+        # The ECDSA signatures check out, the BLS aggregate is checked on the
+        # worker pool before the BM goes to the inbox
+        if self.bls_enabled:
+            self.spawn(self.verify_bls_and_accept(bm, creator_signature))
+        else:
+            self.accept_batched_message(bm, creator_signature)
+
+    async def verify_bls_and_accept(self, bm: BatchedMessages, creator_signature: tuple):
+        started = time.perf_counter()
+        bls_check = await self.bls.verify(
+            base64.b64decode(bm.creator_bls),
+            bm.bls_message_bytes(),
+            bm.aggregated_bls_signature,
+        )
+        self.instrumentation.record("bls_verify", time.perf_counter() - started)
+
+        if bls_check:
+            self.accept_batched_message(bm, creator_signature)
+        else:
+            self.reject_batched_message(bm)
+
+    def accept_batched_message(self, bm: BatchedMessages, creator_signature: tuple):
+        creator_id = self._crypto_keys.ecdsa_tuple_to_id(bm.creator_ecdsa)
+        sender_id = self._crypto_keys.ecdsa_tuple_to_id(bm.sender_ecdsa)
+
+        self.my_logger.info(
+            f"Received BatchedMessage {bm.batch_id.hex()} from: {sender_id} created by {creator_id}"
+        )
+
+        self.verified_creators.add((bm.get_creator_bytes(), creator_signature))
+        # Kept so we can forward the creators signature when we regossip
+        self.creator_signatures.setdefault(bm.batch_id, creator_signature)
+
+        self.spawn(self.inbox(bm))
+
+    def reject_batched_message(self, bm: BatchedMessages):
+        creator_id = self._crypto_keys.ecdsa_tuple_to_id(bm.creator_ecdsa)
+        sender_id = self._crypto_keys.ecdsa_tuple_to_id(bm.sender_ecdsa)
+
+        self.my_logger.error(
+            f"Signature verification failed for {bm} | creator {creator_id} | sender {sender_id}"
+        )
+
+    async def reply_when_verified(
+        self,
+        envelope: list,
+        router_response: bytes,
+        sender_id: str,
+        verified: asyncio.Future,
+    ):
+        # Only a BM that checked out resets recently_missed for its sender
+        if await verified:
+            router_response = self.congestion_update(sender_id)
+
+        self._router.write(envelope + [router_response])
+
+    def congestion_update(self, sender_id: str) -> bytes:
+        router_response = json.dumps(
+            {
+                "status": "CongestionUpdate",
+                "current_latency": self.current_latency,
+                "recently_missed": self.recently_missed_delivery[sender_id],
+            }
+        ).encode()
+
+        self.recently_missed_delivery[sender_id] = False
+
+        return router_response
 
     async def subscriber_listener(self):
         self.my_logger.debug("Starting Subscriber")
         while True:
             if not self.running:
                 break
-            recv = await self._subscriber.read()
+            recv = strip_topic_prefix(await self._subscriber.read())
+            if not recv:
+                continue
 
-            multi_topic = recv[0].decode()
-            responses = recv[1].decode()
-            signatures = recv[2].decode()
-
-            multi_topic = multi_topic.split("|")
-            responses = responses.split("|")
-            signatures = signatures.split("|")
+            codec = codec_for_frame(recv[0])
+            try:
+                frames, batch_sig = codec.split_batch_signature(recv)
+                responses = codec.decode_responses(
+                    frames, self.subscribed_topics.__contains__
+                )
+            except DECODE_ERRORS as e:
+                self.my_logger.warning(f"Dropped malformed responses: {e!r}")
+                continue
 
-            multi_topic = [x for x in multi_topic if x]
-            responses = [json.loads(x) for x in responses if x]
-            signatures = [json.loads(x) for x in signatures if x]
+            batch_checks = {}  # publisher ECDSA key -> batch signature result
 
-            for topic, message, echo_sig in zip(multi_topic, responses, signatures):
+            for topic, message, echo_sig in responses:
                 if topic in self.subscribed_topics:
-                    message_type = message["message_type"]
+                    message_type = message.message_type
+                    tracker = self.quorum_trackers.get(message.batch_id)
+
+                    if tracker is None:
+                        continue
 
-                    message = Response(**message)
+                    publisher = self._crypto_keys.ecdsa_tuple_to_id(message.creator)
 
                     if message_type == "EchoResponse":
-                        sig_check = message.verify_echo_response(echo_sig)
-                        publisher = self._crypto_keys.ecdsa_tuple_to_id(message.creator)
+                        # Replies from peers outside our sample never count, skip the signature check
+                        if publisher not in tracker.echo.sample:
+                            continue
+
+                        sig_check = self.verify_response(
+                            message, echo_sig, frames, batch_sig, batch_checks
+                        )
                         self.my_logger.info(
                             f"Received EchoResponse for {message.topic} from {publisher}"
                         )
                         if sig_check:
-                            self.echo_replies[message.topic].add(publisher)
+                            tracker.echo.add(publisher)
                         else:
                             self.my_logger.warning(
                                 f"Signature check for message {message.topic} from {publisher} failed!!"
                             )
                     elif message_type == "ReadyResponse":
-                        sig_check = message.verify_echo_response(echo_sig)
-                        publisher = self._crypto_keys.ecdsa_tuple_to_id(message.creator)
+                        if publisher not in tracker.ready.sample:
+                            continue
+
+                        sig_check = self.verify_response(
+                            message, echo_sig, frames, batch_sig, batch_checks
+                        )
                         self.my_logger.info(
                             f"Received ReadyResponse for {message.topic} from {publisher}"
                         )
                         if sig_check:
-                            self.ready_replies[message.topic].add(publisher)
+                            tracker.ready.add(publisher)
                         else:
                             self.my_logger.warning(
                                 f"Signature check for message {message.topic} from {publisher} failed!!"
@@ -410,6 +594,29 @@ class Node:
                             f"Received unrecognised message: {message}"
                         )
 
+    def verify_response(
+        self,
+        message: Response,
+        echo_sig: tuple,
+        frames: list,
+        batch_sig: tuple,
+        batch_checks: dict,
+    ) -> bool:
+        if batch_sig is None:
+            with self.instrumentation.timer("verify_response"):
+                return echo_sig is not None and message.verify_echo_response(
+                    echo_sig, self._crypto_keys.signatures
+                )
+
+        # One batch signature covers the whole frame, only check it once per publisher
+        if message.creator not in batch_checks:
+            with self.instrumentation.timer("verify_response"):
+                batch_checks[message.creator] = verify_response_batch(
+                    frames, batch_sig, message.creator, self._crypto_keys.signatures
+                )
+
+        return batch_checks[message.creator]
+
     ####################
     # Message Sending  #
     ####################
@@ -425,101 +632,100 @@ class Node:
     async def unsigned_direct_message(self, message: DirectMessage, receiver=""):
         assert issubclass(type(message), DirectMessage)
 
-        req = await aiozmq.create_zmq_stream(zmq.REQ)
-
-        attempts = 0
-        while attempts < 50:
-            try:
-                async with timeout(1):
-                    await req.transport.connect(receiver)
-                    self.my_logger.info(f"Successfully connected to {receiver}")
-                    break
-            except asyncio.TimeoutError:
-                self.my_logger.warning(
-                    f"Couldnt connect to {receiver}, attempt: {attempts}"
-                )
-                req.close()
-                req = await aiozmq.create_zmq_stream(zmq.REQ)
-                attempts += 1
-                await asyncio.sleep(1)
-        else:
-            self.my_logger.error(
-                f"Failed to connect to {receiver} after {attempts} attempts"
-            )
-
         message = json.dumps(asdict(message)).encode()
 
-        async with self.rep_lock:
-            req.write([message])
-
-            attempts = 0
-            while attempts < 50:
-                try:
-                    async with timeout(1):
-                        await req.read()
-                        self.my_logger.info(f"Received response from {receiver}")
-                        break
-                except asyncio.TimeoutError:
-                    self.my_logger.warning(
-                        f"Didnt receive response from {receiver}, attempt: {attempts}"
-                    )
-                    attempts += 1
-                    await asyncio.sleep(1)
-            else:
-                self.my_logger.error(
-                    f"No reponse received from {receiver} after {attempts} attempts"
-                )
-
-        req.close()
+        try:
+            reply = await self.pool.request(receiver, [message])
+            self.my_logger.info(f"Received response from {receiver}")
+            return reply
+        except (asyncio.TimeoutError, ConnectionError):
+            self.my_logger.error(f"No reponse received from {receiver}")
 
     async def send_signed_batched_message(
         self,
         bm: BatchedMessages,
         receiver="",
     ):
-        creator_sig = json.dumps(bm.sign_as_creator(self._crypto_keys)).encode()
-        sender_sig = json.dumps(bm.sign_as_sender(self._crypto_keys)).encode()
+        codec = self.codec_for_peer(receiver)
 
-        message = json.dumps(asdict(bm)).encode()
+        with self.instrumentation.timer("sign"):
+            creator_signature = self.creator_signature(bm)
+            sender_signature = bm.sign_as_sender(self._crypto_keys)
 
-        req_socket = self.sockets[receiver].socket
+        with self.instrumentation.timer("serialize"):
+            creator_sig = codec.encode_signature(creator_signature)
+            sender_sig = codec.encode_signature(sender_signature)
+            message = codec.encode_message(bm)
 
-        # Allow access to this socket one message at a time
-        async with self.rep_lock:
-            req_socket.write([message, b"", creator_sig, b"", sender_sig])
-            peer_current_latency = await req_socket.read()
+        try:
+            peer_current_latency = await self.request_peer(
+                receiver, [message, b"", creator_sig, b"", sender_sig]
+            )
+        except (asyncio.TimeoutError, ConnectionError):
+            self.my_logger.warning(f"No response from {receiver} after sending BM")
+            self.sampler.record_timeout(receiver, self.request_timeout)
+            return
+
+        congestion_info = json.loads(peer_current_latency[0].decode())
+        status = congestion_info["status"]
+
+        if status == "CongestionUpdate":
+            peer_latency = float(congestion_info["current_latency"])
+            recently_missed = congestion_info["recently_missed"]
+            self.sampler.record_congestion(receiver, peer_latency, recently_missed)
+            if peer_latency > 0.0:
+                self.record_peer_latency(peer_latency)
+
+            if recently_missed:
+                if self.current_latency + 1 < self.max_gossip_timeout_time * 0.85:
+                    self.current_latency += 1
+                    self.batch_scheduler.set_interval(self.current_latency)
+        elif status == "OK":
+            pass
+        else:
+            self.my_logger.warning("Received unknown response after sending BM")
 
-            congestion_info = json.loads(peer_current_latency[0].decode())
-            status = congestion_info["status"]
+    async def send_signed_message(self, message: Echo, receiver: str):
+        # the receiver is an ECDSA ID
+        codec = self.codec_for_peer(receiver)
 
-            if status == "CongestionUpdate":
-                peer_latency = float(congestion_info["current_latency"])
-                recently_missed = congestion_info["recently_missed"]
-                if peer_latency > 0.0:
-                    self.peers_latency.append(peer_latency)
+        with self.instrumentation.timer("sign"):
+            signature = message.sign_message(self._crypto_keys)
 
-                if recently_missed:
-                    if self.current_latency + 1 < self.max_gossip_timeout_time * 0.85:
-                        self.current_latency += 1
-            elif status == "OK":
-                pass
-            else:
-                self.my_logger.warning("Received unknown response after sending BM")
+        with self.instrumentation.timer("serialize"):
+            message_sig = codec.encode_signature(signature)
+            message_bytes = codec.encode_message(message)
 
-    async def send_signed_message(self, message: Echo, receiver: str):
-        # the receiver is an ECDSA ID
-        message_sig = json.dumps(message.sign_message(self._crypto_keys)).encode()
+        try:
+            resp = await self.request_peer(receiver, [message_bytes, b"", message_sig])
+        except (asyncio.TimeoutError, ConnectionError):
+            self.my_logger.warning(f"No response from {receiver} after sending Echo")
+            return
 
-        message = json.dumps(asdict(message)).encode()
+        if resp[0] == b"ALREADY_RECEIVED" and isinstance(message, Echo):
+            # Don't bring back state for a gossip that has already been purged
+            if not self.retention.is_tombstoned(message.batch_id):
+                self.already_received[message.batch_id].add(receiver)
 
-        req_socket = self.sockets[receiver].socket
+    def creator_signature(self, bm: BatchedMessages) -> tuple:
+        batch_id = bm.batch_id
 
-        async with self.rep_lock:
-            req_socket.write([message, b"", message_sig])
-            resp = await req_socket.read()
+        # We only sign the creator part of our own BMs, and only once
+        if batch_id not in self.creator_signatures:
+            self.creator_signatures[batch_id] = bm.sign_as_creator(self._crypto_keys)
 
-            if resp[0] == b"ALREADY_RECEIVED" and isinstance(message, Echo):
-                self.already_received[message.batched_messages_hash].add(receiver)
+        return self.creator_signatures[batch_id]
+
+    def codec_for_peer(self, peer_id: str):
+        return negotiate_codec(self.codec.version, self.peers[peer_id].codec_version)
+
+    async def request_peer(self, receiver: str, frames: list) -> list:
+        # the receiver is an ECDSA ID
+        started = time.perf_counter()
+        reply = await self.pool.request(receiver, frames)
+        # Only answered requests, timeouts would swamp the histogram
+        self.instrumentation.record("send", time.perf_counter() - started)
+        return reply
 
     async def publish_signed_echo_response(self):
         # message = json.dumps(asdict(to_publish)).encode()
@@ -527,30 +733,43 @@ class Node:
         # self._publisher.write([to_publish.topic.encode(), message, echo_sig])
 
         if len(self.pending_responses) >= 1:
-            multi_topic_str = ""
-            resps = ""
-            resp_sigs = ""
+            # Every subscriber has to be able to read what we publish
+            codec = negotiate_codec(
+                self.codec.version,
+                *[peer.codec_version for peer in self.peers.values()],
+            )
 
-            for resp in self.pending_responses:
-                multi_topic_str += resp.topic + "|"
-                resps += json.dumps(asdict(resp)) + "|"
-                resp_sigs += json.dumps(resp.sign(self._crypto_keys)) + "|"
+            if self.subscription_mode == "topic":
+                # One publish per topic, so ZMQ can drop it for peers that didn't subscribe
+                by_topic = {}
+                for resp in self.pending_responses:
+                    by_topic.setdefault(resp.topic, []).append(resp)
 
-            self._publisher.write(
-                [multi_topic_str.encode(), resps.encode(), resp_sigs.encode()]
-            )
+                for topic, responses in by_topic.items():
+                    self._publisher.write(
+                        [topic_prefix(topic, self.id)]
+                        + self.encode_signed_responses(codec, responses)
+                    )
+            else:
+                self._publisher.write(
+                    self.encode_signed_responses(codec, self.pending_responses)
+                )
 
             self.pending_responses.clear()
 
-        if self.job_time_change_flag:
-            self.scheduler.remove_job(self.publish_pending_responses_job_id)
-            updated_job = self.scheduler.add_job(
-                self.publish_signed_echo_response,
-                trigger="interval",
-                seconds=self.publish_pending_frequency,
-            )
-            self.publish_pending_responses_job_id = updated_job.id
-            self.publish_pending_change_flag = False
+    def encode_signed_responses(self, codec, responses: list) -> list:
+        if self.publish_signature_mode == "aggregate":
+            with self.instrumentation.timer("serialize"):
+                frames = codec.encode_responses(responses)
+            with self.instrumentation.timer("sign"):
+                batch_sig = sign_response_batch(frames, self._crypto_keys)
+            frames.append(codec.encode_signature(batch_sig))
+            return frames
+
+        with self.instrumentation.timer("sign"):
+            resp_sigs = [resp.sign(self._crypto_keys) for resp in responses]
+        with self.instrumentation.timer("serialize"):
+            return codec.encode_responses(responses, resp_sigs)
 
     ######################
     # Congestion Control #
@@ -559,62 +778,109 @@ class Node:
     async def ready_response_queue(self, response: Response):
         if response not in self.pending_responses:
             self.pending_responses.append(response)
+            self.publish_scheduler.notify()
 
     async def batched_message_queue(self, gossip: Gossip):
         self.pending_gossips.append(gossip)
-        # asyncio.create_task(self.batch_message_builder_job())
+        self.batch_scheduler.notify(size=gossip.approximate_size())
+        # self.spawn(self.batch_message_builder_job())
+
+    async def submit(self, gossip: Gossip):
+        # Like command(gossip), but waits while the pending queue is full
+        while len(self.pending_gossips) >= self.max_pending_gossips:
+            self.pending_space.clear()
+            await self.pending_space.wait()
+
+        await self.batched_message_queue(gossip)
+
+    def take_batch(self) -> list:
+        # Up to max_batch_gossips / max_batch_bytes from the front of the queue
+        batch = []
+        batch_bytes = 0
+        max_gossips = self.max_batch_gossips
+        if self.bls_enabled:
+            max_gossips = min(max_gossips, self.max_bls_batch_gossips)
+
+        while self.pending_gossips and len(batch) < max_gossips:
+            gossip_bytes = self.pending_gossips[0].approximate_size()
+            # Always take one, so an oversized gossip still goes out
+            if batch and batch_bytes + gossip_bytes > self.max_batch_bytes:
+                break
+
+            batch.append(self.pending_gossips.popleft())
+            batch_bytes += gossip_bytes
+
+        return batch
 
     async def batch_message_builder_job(self):
-        if len(self.pending_gossips) >= 1:
-            mtree = MerkleTree([str(hash(x)) for x in self.pending_gossips])
+        while self.pending_gossips:
+            messages = self.take_batch()
+            leaves = [x.digest.hex() for x in messages]
+            # MerkleTree needs at least two leaves, a lone gossip is paired with itself
+            if len(leaves) == 1:
+                leaves = leaves * 2
+            mtree = MerkleTree(leaves)
 
             bm = BatchedMessages(
                 message_type="BatchedMessage",
                 creator_bls=self._crypto_keys.bls_public_key_string,
                 creator_ecdsa=self._crypto_keys.ecdsa_public_key_tuple,
                 sender_ecdsa=self._crypto_keys.ecdsa_public_key_tuple,
-                messages=tuple(self.pending_gossips),
-                # aggregated_bls_signature=self.sign_messages_with_BLS(messages),
-                aggregated_bls_signature="111",
+                messages=tuple(messages),
+                aggregated_bls_signature=UNSIGNED_BLS_SIGNATURE,
                 merkle_root=mtree.root.hex(),
                 vector_clock=self.vector_clock.items(),
             )
 
-            asyncio.create_task(self.gossip(bm))
+            if self.bls_enabled:
+                # Signing takes a while, don't hold up the next batch
+                self.signing_batches += 1
+                self.spawn(self.sign_and_gossip(bm))
+            else:
+                self.count_sent_batch(bm)
+                self.spawn(self.gossip(bm))
+
+        self.pending_space.set()
+
+    def count_sent_batch(self, bm: BatchedMessages):
+        self.sent_gossips += 1
+        self.sent_msg_metadata.append((len(bm.messages), time.time(), self.id))
 
-            self.sent_gossips += 1
-            self.sent_msg_metadata.append(
-                (len(self.pending_gossips), time.time(), self.id)
+    async def sign_and_gossip(self, bm: BatchedMessages):
+        started = time.perf_counter()
+        try:
+            signature = await self.bls.sign(
+                self._crypto_keys.bls_private_key, bm.bls_message_bytes()
             )
-            self.pending_gossips.clear()
-
-        if self.job_time_change_flag:
-            self.scheduler.remove_job(self.batched_message_job_id)
-            updated_job = self.scheduler.add_job(
-                self.batch_message_builder_job,
-                trigger="interval",
-                seconds=self.current_latency,
+        except Exception as e:
+            self.my_logger.error(
+                f"BLS signing failed, dropping a batch of {len(bm.messages)} gossips: {e!r}"
             )
-            self.batched_message_job_id = updated_job.id
-            self.job_time_change_flag = False
+            return
+        finally:
+            self.signing_batches -= 1
+        self.instrumentation.record("bls_sign", time.perf_counter() - started)
 
-    async def increasing_congestion_monitoring_job(self):
-        from scipy.signal import savgol_filter
+        self.count_sent_batch(bm)
+        await self.gossip(evolve(bm, aggregated_bls_signature=signature))
+
+    def record_our_latency(self, latency: float):
+        self.our_latency.append(latency)
+        self.plato.add_our_latency(latency)
 
+    def record_peer_latency(self, latency: float):
+        self.peers_latency.append(latency)
+        self.plato.add_peer_latency(latency)
+
+    async def increasing_congestion_monitoring_job(self):
         await asyncio.sleep(random.uniform(0.1, 2.5))
         # Increase the block time if we start overshooting the target
         if len(self.our_latency) >= 20 and len(self.peers_latency) >= 20:
-            # filtered_zlema = savgol_filter(self.our_latency, 14, 1)
-            # filtered_zlema = kalman_filter(ZLEMA(14, self.our_latency))
-            # filtered_zlema = [x for x in SMA(14, self.our_latency) if x]
-            # filtered_zlema = [x for x in EMA(14, self.our_latency) if x]
-            # filtered_zlema = [x for x in KAMA(14, 2, 30, self.our_latency) if x]
-
-            our_smooth_latency = savgol_filter(self.our_latency, 14, 1)
-            our_peers_smooth_latency = savgol_filter(self.peers_latency, 14, 1)
+            ours = self.plato.ours
+            peers = self.plato.peers
 
             weighted_latest_latency = round(
-                (our_smooth_latency[-1] * 0.6) + (our_peers_smooth_latency[-1] * 0.4),
+                (ours.short_fit.value * 0.6) + (peers.short_fit.value * 0.4),
                 3,
             )
 
@@ -628,13 +894,10 @@ class Node:
                         f"[{weighted_latest_latency}] [Latency Fastforward] (/\) - New Target: {self.current_latency}"
                     )
 
-                    self.job_time_change_flag = True
-            elif len(our_smooth_latency) >= 15 and len(our_peers_smooth_latency) >= 15:
-                # rsi = int(RSI(21, filtered_zlema)[-1])
-                # rsi = TSI(3, 6, filtered_zlema)[-1]
-
-                our_latency_rsi = int(RSI(14, our_smooth_latency)[-1])
-                our_peers_latency_rsi = int(RSI(14, our_peers_smooth_latency)[-1])
+                    self.batch_scheduler.set_interval(self.current_latency)
+            elif ours.short_rsi.value is not None and peers.short_rsi.value is not None:
+                our_latency_rsi = int(ours.short_rsi.value)
+                our_peers_latency_rsi = int(peers.short_rsi.value)
 
                 increase = random.uniform(1.01, 1.1)
 
@@ -645,7 +908,7 @@ class Node:
 
                 # Stops current_latency increase when network has low latency.
                 latency_under_target = (
-                    False if our_smooth_latency[-1] < self.target_latency else True
+                    False if ours.short_fit.value < self.target_latency else True
                 )
 
                 # TSI +30
@@ -655,13 +918,15 @@ class Node:
                     and latency_under_target
                 ):
                     self.current_latency = round(self.current_latency * increase, 3)
-                    self.job_time_change_flag = True
+                    self.batch_scheduler.set_interval(self.current_latency)
 
                     if self.publish_pending_frequency < self.max_publishing_frequency:
                         self.publish_pending_frequency = round(
                             self.publish_pending_frequency * increase, 3
                         )
-                        self.publish_pending_change_flag = True
+                        self.publish_scheduler.set_interval(
+                            self.publish_pending_frequency
+                        )
 
                     self.my_logger.error(
                         f"[High RSI - /\] T: {self.current_latency} P/FQ: {self.publish_pending_frequency} W: {weighted_latest_latency} O/L: {our_latency_rsi} O/P: {our_peers_latency_rsi}"
@@ -670,29 +935,18 @@ class Node:
             self.current_latency_metadata.append((time.time(), weighted_latest_latency))
 
     async def decrease_congestion_monitoring_job(self):
-        from scipy.signal import savgol_filter
-
         # Increase the block time if we start overshooting the target
         if len(self.our_latency) >= 45 and len(self.peers_latency) >= 45:
-            # filtered_zlema = kalman_filter(ZLEMA(21, self.our_latency))
-            # filtered_zlema = savgol_filter(self.our_latency, 21, 1)
-            # filtered_zlema = [x for x in SMA(22, self.our_latency) if x]
-            # filtered_zlema = [x for x in EMA(21, self.our_latency) if x]
-            # filtered_zlema = [x for x in KAMA(21, 2, 30, self.our_latency) if x]
-
-            our_smooth_latency = savgol_filter(self.our_latency, 21, 1)
-            our_peers_smooth_latency = savgol_filter(self.peers_latency, 21, 1)
+            ours = self.plato.ours
+            peers = self.plato.peers
 
             weighted_latest_latency = round(
-                (our_smooth_latency[-1] * 0.6) + (our_peers_smooth_latency[-1] * 0.4), 3
+                (ours.long_fit.value * 0.6) + (peers.long_fit.value * 0.4), 3
             )
 
-            if len(our_smooth_latency) >= 21 and len(our_peers_smooth_latency) >= 21:
-                # rsi = int(RSI(21, filtered_zlema)[-1])
-                # rsi = TSI(9, 15, filtered_zlema)[-1]
-
-                our_latency_rsi = int(RSI(21, our_smooth_latency)[-1])
-                our_peers_latency_rsi = int(RSI(21, our_peers_smooth_latency)[-1])
+            if ours.long_rsi.value is not None and peers.long_rsi.value is not None:
+                our_latency_rsi = int(ours.long_rsi.value)
+                our_peers_latency_rsi = int(peers.long_rsi.value)
 
                 decrease = random.uniform(0.9, 0.99)
 
@@ -723,14 +977,16 @@ class Node:
                     self.my_logger.error(
                         f"[{weighted_latest_latency}] [Low RSI] [{our_latency_rsi}] / [{our_peers_latency_rsi}] (\/) - New Target: {self.current_latency}"
                     )
-                    self.job_time_change_flag = True
+                    self.batch_scheduler.set_interval(self.current_latency)
 
                     if self.publish_pending_frequency > self.minimum_latency:
                         self.publish_pending_frequency = round(
                             self.publish_pending_frequency * decrease, 3
                         )
 
-                        self.publish_pending_change_flag = True
+                        self.publish_scheduler.set_interval(
+                            self.publish_pending_frequency
+                        )
                 else:
                     self.my_logger.error(
                         f" latest: [{weighted_latest_latency}] current: {self.current_latency}"
@@ -738,7 +994,7 @@ class Node:
 
             # Latency is very low, increase message sending frequency
             # elif (
-            #     our_smooth_latency[-1] < 0.25 * self.target_latency
+            #     ours.long_fit.value < 0.25 * self.target_latency
             #     and dont_go_below_minimum
             # ):
             #     self.current_latency = round(self.current_latency * decrease, 3)
@@ -746,7 +1002,7 @@ class Node:
             #     self.my_logger.error(
             #         f"[Low Latency] [{our_latency_rsi}] / [{our_peers_latency_rsi}] (\/) - New Target: {self.current_latency}"
             #     )
-            #     self.job_time_change_flag = True
+            #     self.batch_scheduler.set_interval(self.current_latency)
 
             self.current_latency_metadata.append((time.time(), weighted_latest_latency))
 
@@ -756,7 +1012,9 @@ class Node:
 
     # AT2 starts here
     async def gossip(self, bm: BatchedMessages):
-        batched_message_hash = str(hash(bm))
+        started = time.monotonic()
+        batch_id = bm.batch_id
+        topic = batch_id.hex()  # how peers refer to the batch
 
         i_am_message_creator = (
             True
@@ -771,7 +1029,7 @@ class Node:
 
         # Step 2
         for peer_id in echo_subscribe:
-            s2p = SubscribeToPublisher(peer_id, batched_message_hash)
+            s2p = SubscribeToPublisher(peer_id, topic)
             self.command(s2p)
 
         # Step 3
@@ -779,15 +1037,19 @@ class Node:
             self.node_selection_type, self.at2_config.ready_sample_size
         )
 
+        # Counts replies from echo_subscribe and ready_subscribe as they arrive
+        tracker = QuorumTracker.from_samples(echo_subscribe, ready_subscribe)
+        self.quorum_trackers[batch_id] = tracker
+
         # Step 4
         for peer_id in ready_subscribe:
-            s2p = SubscribeToPublisher(peer_id, batched_message_hash)
+            s2p = SubscribeToPublisher(peer_id, topic)
             self.command(s2p)
 
         # Step 5
         es = Echo(
             "EchoSubscribe",
-            batched_message_hash,
+            topic,
             self._crypto_keys.ecdsa_public_key_tuple,
         )
 
@@ -797,7 +1059,7 @@ class Node:
         # Step 6
         rs = Echo(
             "ReadySubscribe",
-            batched_message_hash,
+            topic,
             self._crypto_keys.ecdsa_public_key_tuple,
         )
 
@@ -809,46 +1071,34 @@ class Node:
             self.vector_clock[self.id] += 1
 
         # step 8
-        if (
-            len(ready_subscribe.intersection(self.ready_replies[batched_message_hash]))
-            < self.at2_config.feedback_threshold
-        ):
-            # If the message doesn't have enough ready_replies, assume it hasn't been propagated
+        if not tracker.ready.reached(self.at2_config.feedback_threshold):
+            # If the message doesn't have enough ready replies, assume it hasn't been propagated
             # enough, send the message to our echo_subscribe group
-            self.received_messages[batched_message_hash] = bm
+            self.received_messages[batch_id] = bm
             for peer_id in echo_subscribe:
-                if peer_id not in self.already_received[batched_message_hash]:
+                if peer_id not in self.already_received[batch_id]:
                     self.command(bm, peer_id)
 
         # Step 9
-        # Using intersection to only count echos from nodes in our echo_subscribe set() we defined earlier
-        retry_time_echo = 0
+        # The tracker only counts echos from nodes in our echo_subscribe set() we defined earlier
         echo_failure = False
-        while (
-            len(echo_subscribe.intersection(self.echo_replies[batched_message_hash]))
-            < self.at2_config.ready_threshold
-        ):
-            if retry_time_echo == self.max_gossip_timeout_time:
-                break
-            await asyncio.sleep(0.25)
-
-            retry_time_echo += 0.25
+        retry_time_echo = await self.wait_for_quorum(
+            tracker.echo, self.at2_config.ready_threshold
+        )
+        self.instrumentation.record("echo_quorum", retry_time_echo)
 
-        if (
-            len(echo_subscribe.intersection(self.echo_replies[batched_message_hash]))
-            >= self.at2_config.ready_threshold
-        ):
+        if tracker.echo.reached(self.at2_config.ready_threshold):
             ready = Response(
                 "ReadyResponse",
-                batched_message_hash,
+                topic,
                 self._crypto_keys.ecdsa_public_key_tuple,
             )
 
             self.command(ready)
-            self.my_logger.warning(f"Ready for: {batched_message_hash}")
+            self.my_logger.warning(f"Ready for: {topic}")
         else:
             self.my_logger.error(
-                f"Echo Failure: {batched_message_hash} got: {len(echo_subscribe.intersection(self.echo_replies[batched_message_hash]))} needed: {self.at2_config.ready_threshold}"
+                f"Echo Failure: {topic} got: {tracker.echo_count} needed: {self.at2_config.ready_threshold}"
             )
 
             for peer in self.recently_missed_delivery:
@@ -857,39 +1107,32 @@ class Node:
             echo_failure = True
 
         # Step 10
-        # Using intersection to only count ready messages from nodes in our ready_replies set() we defined earlier
+        # The tracker only counts ready messages from nodes in our ready_subscribe set() we defined earlier
         retry_time_ready = 0
-        while (
-            len(ready_subscribe.intersection(self.ready_replies[batched_message_hash]))
-            < self.at2_config.delivery_threshold
-        ):
-            if retry_time_ready == self.max_gossip_timeout_time:
-                break
-            elif echo_failure:
-                break
-
-            await asyncio.sleep(0.1)
-
-            retry_time_ready += 0.1
+        if not echo_failure:
+            retry_time_ready = await self.wait_for_quorum(
+                tracker.ready, self.at2_config.delivery_threshold
+            )
+            self.instrumentation.record("ready_quorum", retry_time_ready)
 
-        if (
-            len(ready_subscribe.intersection(self.ready_replies[batched_message_hash]))
-            >= self.at2_config.delivery_threshold
-        ):
+        if tracker.ready.reached(self.at2_config.delivery_threshold):
             self.delivered_gossips += 1
             vector_clock_without_node_id = [value for key, value in bm.vector_clock]
 
             self.sequenced_messages.add(
-                (tuple(vector_clock_without_node_id), batched_message_hash)
+                (tuple(vector_clock_without_node_id), batch_id)
             )
 
             if i_am_message_creator:
                 self.delivered_msg_metadata.append((time.time(), len(bm.messages)))
+                self.delivery_latency_metadata.append(
+                    (time.time(), time.monotonic() - started)
+                )
 
-            self.my_logger.warning(f"{batched_message_hash} has been delivered!")
+            self.my_logger.warning(f"{topic} has been delivered!")
         else:
             self.my_logger.error(
-                f"ReadyResponse Failure: {batched_message_hash} got: {len(ready_subscribe.intersection(self.ready_replies[batched_message_hash]))} needed: {self.at2_config.delivery_threshold}"
+                f"ReadyResponse Failure: {topic} got: {tracker.ready_count} needed: {self.at2_config.delivery_threshold}"
             )
 
             # Dount double enter missed delivery if the echo also failed
@@ -897,15 +1140,19 @@ class Node:
                 for peer in self.recently_missed_delivery:
                     self.recently_missed_delivery[peer] = True
 
-        self.our_latency.append(retry_time_ready + retry_time_echo)
+        self.record_our_latency(retry_time_ready + retry_time_echo)
         self.received_msg_metadata.append(
             (retry_time_ready + retry_time_echo, time.time())
         )
 
         # Step 11
-        unsub = UnsubscribeFromTopic(batched_message_hash)
+        unsub = UnsubscribeFromTopic(topic)
         self.command(unsub)
 
+        # Step 12
+        # Keep the state around for late Echo/ReadySubscribes, then drop it
+        self.retention.schedule(batch_id)
+
         # setup variables
         """
             Subscribing and sample sizes
@@ -965,27 +1212,72 @@ class Node:
             ReadySubscribe message, the node will send the orginal message and regossip it.
             """
 
+    def have_received(self, batch_id: bytes) -> bool:
+        return batch_id in self.received_messages or self.retention.is_tombstoned(
+            batch_id
+        )
+
+    async def purge_expired_state(self):
+        for batch_id in self.retention.pop_expired():
+            self.received_messages.pop(batch_id, None)
+            self.creator_signatures.pop(batch_id, None)
+            self.already_received.pop(batch_id, None)
+            self.quorum_trackers.pop(batch_id, None)
+
+    def state_stats(self) -> dict:
+        per_hash_state = {
+            "received_messages": self.received_messages,
+            "creator_signatures": self.creator_signatures,
+            "already_received": self.already_received,
+            "quorum_trackers": self.quorum_trackers,
+            "topic_subscriptions": self.topic_subscriptions,
+            "tombstones": self.retention.tombstones,
+            "verified_creators": self.verified_creators.entries,
+        }
+
+        stats = {name: len(entries) for name, entries in per_hash_state.items()}
+        stats["pending_expiry"] = self.retention.pending()
+        stats["expired"] = self.retention.expired_count
+        # Size of the dicts themselves, not what they point to
+        stats["container_bytes"] = sum(
+            sys.getsizeof(entries) for entries in per_hash_state.values()
+        )
+        stats["rss_bytes"] = psutil.Process().memory_info().rss
+
+        return stats
+
+    async def wait_for_quorum(self, counter, threshold: int) -> float:
+        # Returns how long we waited for threshold replies
+        started = time.monotonic()
+
+        await counter.wait(threshold, self.max_gossip_timeout_time)
+
+        return time.monotonic() - started
+
+    def spawn(self, coro) -> asyncio.Task:
+        return self.instrumentation.spawn(coro)
+
     ####################
     # Node Message Bus #
     ####################
     def command(self, command_obj, receiver=""):
         if isinstance(command_obj, SubscribeToPublisher):
-            asyncio.create_task(self.subscribe(command_obj))
+            self.spawn(self.subscribe(command_obj))
         elif isinstance(command_obj, Gossip):
-            asyncio.create_task(self.batched_message_queue(command_obj))
+            self.spawn(self.batched_message_queue(command_obj))
         elif isinstance(command_obj, UnsubscribeFromTopic):
-            asyncio.create_task(self.unsubscribe(command_obj))
+            self.spawn(self.unsubscribe(command_obj))
         elif issubclass(type(command_obj), BatchedMessages):
-            asyncio.create_task(self.send_signed_batched_message(command_obj, receiver))
+            self.spawn(self.send_signed_batched_message(command_obj, receiver))
         elif issubclass(type(command_obj), Echo):
-            asyncio.create_task(self.send_signed_message(command_obj, receiver))
+            self.spawn(self.send_signed_message(command_obj, receiver))
         elif issubclass(type(command_obj), Response):
-            asyncio.create_task(self.ready_response_queue(command_obj))
-            # asyncio.create_task(self.publish_signed_echo_response(command_obj))
+            self.spawn(self.ready_response_queue(command_obj))
+            # self.spawn(self.publish_signed_echo_response(command_obj))
         elif issubclass(type(command_obj), DirectMessage):
-            asyncio.create_task(self.unsigned_direct_message(command_obj, receiver))
+            self.spawn(self.unsigned_direct_message(command_obj, receiver))
         elif isinstance(command_obj, PublishMessage):
-            asyncio.create_task(self.unsigned_publish(command_obj))
+            self.spawn(self.unsigned_publish(command_obj))
         else:
             self.my_logger.error(f"Unrecognised command object: {command_obj}")
 
@@ -993,78 +1285,120 @@ class Node:
     # Helper Functions #
     ####################
 
-    def calculate_uniform_params(self):
-        num_nodes = len(self.peers)
-        mean = (num_nodes - 1) / 2
-        std_dev = math.sqrt(num_nodes)
-        return mean, std_dev
-
     def select_nodes(self, algorithm: str, num_nodes_to_select: int) -> set:
-        assert algorithm in ["normal", "random", "poisson"]
-        selected_nodes = set()
-
-        if algorithm == "poisson":
-            rate = 5
-
-            num_nodes = len(self.peers)
-            poisson_distribution = poisson(rate)
-
-            while len(selected_nodes) < num_nodes_to_select:
-                selected_indices = (
-                    poisson_distribution.rvs(size=num_nodes_to_select) % num_nodes
-                )
-                selected_nodes = set(
-                    [list(self.peers)[index] for index in selected_indices]
-                )
-        elif algorithm == "normal":
-            mean, std_dev = self.calculate_uniform_params()
-            while len(selected_nodes) < num_nodes_to_select:
-                selected_indices = norm.rvs(
-                    loc=mean, scale=std_dev, size=num_nodes_to_select
-                )
-                selected_indices = [
-                    int(idx) % len(self.peers) for idx in selected_indices
-                ]
-                selected_nodes = set(
-                    [list(self.peers)[idx] for idx in selected_indices]
-                )
-        elif algorithm == "random":
-            selected_nodes = random.sample(list(self.peers), num_nodes_to_select)
+        assert algorithm in ["normal", "random", "poisson", "latency"]
 
-        return set(selected_nodes)
+        return self.sampler.sample(algorithm, num_nodes_to_select)
 
-    def sign_messages_with_BLS(self, messages):
-        # Messages are signed with the BLS private key
-        messages_as_bytes = [json.dumps(asdict(x)).encode() for x in messages]
-        sigs = []
-        agg_sig = None
+    def peer_statistics(self) -> dict:
+        # What the 'latency' selection mode knows about each peer, and its weight
+        return self.sampler.peer_statistics()
 
-        for msg_byte in messages_as_bytes:
-            sigs.append(bls_pop.Sign(self._crypto_keys.bls_private_key, msg_byte))
-
-        # Don't aggregate if we only have 1 signature
-        if len(sigs) > 1:
-            agg_sig = bls_pop.Aggregate(sigs)
-        else:
-            agg_sig = sigs[0]
-
-        # return as base64 for easier serialisation
-        return base64.b64encode(agg_sig).decode("utf-8")
-
-    async def peer_discovery(self, routers: list):
-        pd = PeerDiscovery(
+    def peer_discovery_message(self) -> PeerDiscovery:
+        return PeerDiscovery(
             message_type="PeerDiscovery",
             bls_public_key=self._crypto_keys.bls_public_key,
             ecdsa_public_key=self._crypto_keys.ecdsa_public_key_tuple,
             router_address=self.router_bind,
             publisher_address=self.publisher_bind,
+            codec_version=self.codec.version,
         )
 
+    def peer_record(self, pd: PeerDiscovery) -> dict:
+        record = asdict(pd)
+        # Received PeerDiscovery messages hold the raw BLS key, send it as base64 like the original
+        if isinstance(record["bls_public_key"], bytes):
+            record["bls_public_key"] = base64.b64encode(record["bls_public_key"]).decode()
+        return record
+
+    def known_peers_reply(self) -> bytes:
+        records = [self.peer_record(self.peer_discovery_message())]
+        records += [self.peer_record(pd) for pd in self.peers.values()]
+
+        return json.dumps({"status": "OK", "peers": records}).encode()
+
+    async def learn_peers(self, reply: list) -> list:
+        # Returns the router addresses of peers we didn't know about
+        try:
+            records = json.loads(reply[0].decode())["peers"]
+        except (ValueError, KeyError, TypeError, IndexError):
+            return []
+
+        learned = []
+        for record in records:
+            # One malformed record shouldn't cost us the rest of the reply
+            try:
+                pd = PeerDiscovery(**record)
+                ecdsa_id = self._crypto_keys.ecdsa_tuple_to_id(pd.ecdsa_public_key)
+            except DECODE_ERRORS as e:
+                self.my_logger.warning(f"Skipping malformed peer record: {e!r}")
+                continue
+
+            if ecdsa_id != self.id and ecdsa_id not in self.peers:
+                await self.inbox(pd)
+                learned.append(pd.router_address)
+
+        return learned
+
+    def check_cluster_ready(self):
+        if (
+            not self.cluster_ready.is_set()
+            and self.expected_peers is not None
+            and len(self.peers) >= self.expected_peers
+        ):
+            if self.discovery_started is not None:
+                self.time_to_ready = time.monotonic() - self.discovery_started
+            self.cluster_ready.set()
+            self.my_logger.warning(
+                f"Cluster ready with {len(self.peers)} peers after {self.time_to_ready}s"
+            )
+
+    async def peer_discovery(self, routers: list, expected_peers: int = None):
+        # routers can be a few seeds, replies tell us about the rest of the cluster
+        pd = self.peer_discovery_message()
+
+        self.discovery_started = time.monotonic()
+        self.expected_peers = len(routers) if expected_peers is None else expected_peers
+        self.check_cluster_ready()
+
+        semaphore = asyncio.Semaphore(self.discovery_concurrency)
+        contacted = set(routers) | {self.router_bind}
+
+        async def discover(ip: str):
+            async with semaphore:
+                reply = await self.unsigned_direct_message(pd, ip)
+
+            if reply is None:
+                return
+
+            new_routers = [
+                router for router in await self.learn_peers(reply) if router not in contacted
+            ]
+            contacted.update(new_routers)
+
+            # Introduce ourselves to peers we only heard about second hand
+            await asyncio.gather(*[discover(router) for router in new_routers])
+
         random.shuffle(routers)
+        pending = routers
+
+        # Send the PD message to all peers. Everyone starts at once, so early
+        # replies can be missing peers, keep asking until we know enough.
+        while True:
+            await asyncio.gather(*[discover(ip) for ip in pending])
+
+            if self.cluster_ready.is_set():
+                break
+
+            if time.monotonic() - self.discovery_started > self.discovery_timeout:
+                self.my_logger.error(
+                    f"Peer discovery gave up after {self.discovery_timeout}s, "
+                    f"found {len(self.peers)} of {self.expected_peers} peers"
+                )
+                break
 
-        # Send the PD message to all peers
-        for ip in routers:
-            await self.unsigned_direct_message(pd, ip)
+            await asyncio.sleep(self.discovery_retry_interval)
+            pending = list(contacted - {self.router_bind})
 
     async def subscribe_to_all_peers_and_topics(self):
         # peer_id is a key from the self.peers dict
@@ -1072,7 +1406,9 @@ class Node:
         for peer_id in self.peers:
             self._subscriber.transport.connect(self.peers[peer_id].publisher_address)
 
-        self._subscriber.transport.subscribe(b"")
+        # In topic mode subscriptions are added per batch in subscribe()
+        if self.subscription_mode == "all":
+            self._subscriber.transport.subscribe(b"")
 
     async def subscribe(self, s2p: SubscribeToPublisher):
         # peer_id is a key from the self.peers dict
@@ -1080,47 +1416,67 @@ class Node:
         if s2p.topic not in self.subscribed_topics:
             self.subscribed_topics.add(s2p.topic)
 
+        if self.subscription_mode == "topic":
+            peer_ids = self.topic_subscriptions.setdefault(s2p.topic, set())
+
+            if s2p.peer_id not in peer_ids:
+                peer_ids.add(s2p.peer_id)
+                self._subscriber.transport.subscribe(
+                    topic_prefix(s2p.topic, s2p.peer_id)
+                )
+
     async def unsubscribe(self, s2p: UnsubscribeFromTopic):
         # peer_id is a key from the self.peers dict
 
         if s2p.topic in self.subscribed_topics:
             self.subscribed_topics.remove(s2p.topic)
 
-    async def init_sockets(self):
-        self._subscriber = await aiozmq.create_zmq_stream(zmq.SUB)
+        for peer_id in self.topic_subscriptions.pop(s2p.topic, set()):
+            self._subscriber.transport.unsubscribe(topic_prefix(s2p.topic, peer_id))
 
-        import os
-
-        node_port = int(os.getenv("NODE_ID"))
-
-        self._publisher = await aiozmq.create_zmq_stream(
-            zmq.PUB, bind=f"tcp://*:{21001 + node_port}"
-        )
-        self._router = await aiozmq.create_zmq_stream(
-            zmq.ROUTER, bind=f"tcp://*:{20001 + node_port}"
-        )
+    async def init_sockets(self):
+        self._subscriber = await self.stream_factory(zmq.SUB)
+        self._publisher = await self.stream_factory(zmq.PUB, bind=self.publisher_bind)
+        self._router = await self.stream_factory(zmq.ROUTER, bind=self.router_bind)
 
-        ecdsa_private_key = keys.gen_private_key(curve.P256)
-        ecdsa_public_key = keys.get_public_key(ecdsa_private_key, curve.P256)
-        ecdsa_public_key_tuple = (ecdsa_public_key.x, ecdsa_public_key.y)
+        signatures = get_signature_scheme(self.signature_scheme)
+        ecdsa_private_key, ecdsa_public_key_tuple = signatures.generate_keys()
 
-        bls_private_key = secrets.randbits(128)
-        bls_public_key = bls_pop.SkToPk(bls_private_key)
+        bls_private_key, bls_public_key = get_bls_backend(self.bls_backend).generate_keys()
         bls_public_key_string = base64.b64encode(bls_public_key).decode("utf-8")
 
         self._crypto_keys = CryptoKeys(
             ecdsa_private_key,
-            ecdsa_public_key,
             ecdsa_public_key_tuple,
             bls_private_key,
             bls_public_key,
             bls_public_key_string,
+            signatures,
         )
 
-        self.id = str(hash(self._crypto_keys.ecdsa_public_key_tuple))[:10]
+        self.id = public_key_id(self._crypto_keys.ecdsa_public_key_tuple)
+
+        self.codec = CODECS[self.wire_codec]
+
+        self.verified_creators = VerifiedSignatureCache(
+            self.verified_signature_cache_size, self.max_gossip_timeout_time
+        )
+
+        self.retention = StateRetention(self.retention_time, self.max_tombstones)
 
         self.my_logger = get_logger(self.id)
 
+        self.pool = ConnectionPool(
+            self.transport_mode,
+            self.request_timeout,
+            heartbeat_interval=self.heartbeat_interval,
+            heartbeat_timeout=self.heartbeat_timeout,
+            on_rtt=self.sampler.record_rtt,
+            on_lock_wait=partial(self.instrumentation.record, "req_lock_wait"),
+            stream_factory=self.stream_factory,
+            logger=self.my_logger,
+        )
+
         self.my_logger.debug("Started PUB/SUB Sockets", extra={"published": "aaaa"})
 
     def statistics(self):
@@ -1129,17 +1485,86 @@ class Node:
         print(f"Messages Delivered: {self.delivered_gossips}")
         print(f"Average RTT: {sum(self.our_latency) / len(self.our_latency)}")
         print(f"Min RTT: {min(self.our_latency)} / Max RTT {max(self.our_latency)}")
+        print(f"SBRB State: {self.state_stats()}")
+        print(
+            f"Batch interval: {self.batch_scheduler.achieved_interval} / Publish interval: {self.publish_scheduler.achieved_interval}"
+        )
+        print(f"Stages: {json.dumps(self.instrumentation.snapshot(), indent=2)}")
+        if self.bls is not None:
+            print(f"BLS: {self.bls.statistics()}")
 
     def stop(self):
         self.running = False
+        for listener in self.listeners:
+            listener.cancel()
+        self.pool.close()
+        if self.verification_mode == "pipeline":
+            self.verifier.stop()
+        if self.bls is not None:
+            self.bls.stop()
+        self.batch_scheduler.stop()
+        self.publish_scheduler.stop()
+        self.scheduler.shutdown(wait=False)
+        if self.metrics_server is not None:
+            self.metrics_server.close()
         self._publisher.close()
         self._subscriber.close()
         self._router.close()
 
     async def start(self):
         self.running = True
-        asyncio.create_task(self.router_listener())
-        asyncio.create_task(self.subscriber_listener())
+
+        # Batching and publishing run in the event loop so PLATO's interval
+        # changes apply straight away
+        self.batch_scheduler = AdaptiveFlushScheduler(
+            self.batch_message_builder_job,
+            random.randint(
+                int(self.target_latency * 0.75), int(self.target_latency * 1.25)
+            ),
+            max_pending_count=self.batch_flush_count,
+            max_pending_bytes=self.batch_flush_bytes,
+            logger=self.my_logger,
+        )
+        self.publish_scheduler = AdaptiveFlushScheduler(
+            self.publish_signed_echo_response,
+            random.randint(
+                int(self.target_publishing_frequency * 0.75),
+                int(self.target_publishing_frequency * 1.25),
+            ),
+            max_pending_count=self.publish_flush_count,
+            logger=self.my_logger,
+        )
+
+        if self.bls_enabled:
+            self.bls = BlsService(
+                workers=self.bls_workers,
+                backend=self.bls_backend,
+                max_pending=self.bls_max_pending,
+            )
+            self.bls.start()
+
+        if self.verification_mode == "pipeline":
+            self.verifier = VerificationPipeline(
+                on_verified=self.signatures_verified,
+                on_failed=self.reject_batched_message,
+                batch_window=self.verification_batch_window,
+                max_batch_size=self.verification_max_batch,
+                workers=self.verification_workers,
+                signature_scheme=self.signature_scheme,
+                logger=self.my_logger,
+            )
+            self.verifier.start()
+
+        self.listeners = [
+            self.spawn(self.router_listener()),
+            self.spawn(self.subscriber_listener()),
+        ]
+        self.pool.start()
+
+        if self.metrics_port is not None:
+            self.metrics_server = await serve_metrics(
+                self.instrumentation, self.metrics_port, {"node": self.id}
+            )
 
         await asyncio.sleep(random.randint(1, 3))
 
@@ -1147,17 +1572,11 @@ class Node:
 
         self.publish_pending_frequency = self.target_publishing_frequency
 
+        self.batch_scheduler.start()
+        self.publish_scheduler.start()
+
         # # Add the job to the scheduler, which triggers every 10 seconds
         self.scheduler = AsyncIOScheduler()
-        job = self.scheduler.add_job(
-            self.batch_message_builder_job,
-            trigger="interval",
-            seconds=random.randint(
-                int(self.target_latency * 0.75), int(self.target_latency * 1.25)
-            ),
-        )
-        self.batched_message_job_id = job.id
-
         job = self.scheduler.add_job(
             self.increasing_congestion_monitoring_job,
             trigger="interval",
@@ -1174,17 +1593,12 @@ class Node:
 
         self.decrease_job_id = job.id
 
-        job = self.scheduler.add_job(
-            self.publish_signed_echo_response,
+        self.scheduler.add_job(
+            self.purge_expired_state,
             trigger="interval",
-            seconds=random.randint(
-                int(self.publish_pending_frequency * 0.75),
-                int(self.publish_pending_frequency * 1.25),
-            ),
+            seconds=self.retention_purge_interval,
         )
 
-        self.publish_pending_responses_job_id = job.id
-
         # # Start the scheduler
         self.scheduler.start()
         self.my_logger.debug("Started Jobs")
@@ -0,0 +1,177 @@
+from attrs import Factory, define, evolve, field, validators
+from collections import deque
+from typing import Optional
+
+
+@define
+class RollingLinearFit:
+    # Fits a line through the last `window` samples and reports its value at
+    # the newest sample, the same as the end of savgol_filter(x, window, 1).
+    # The sums are updated per sample instead of refitting the whole window.
+    window: int = field(validator=[validators.instance_of(int)])
+    recompute_every: int = field(default=1000)  # resum now and then to stop float drift
+
+    values: deque = field(init=False)
+    sum_y: float = field(default=0.0)
+    sum_xy: float = field(default=0.0)  # x is the position in the window, oldest is 0
+    updates: int = field(default=0)
+    mean: Optional[float] = field(default=None)
+    slope: float = field(default=0.0)
+    value: Optional[float] = field(default=None)
+
+    def __attrs_post_init__(self):
+        self.values = deque(maxlen=self.window)
+
+    def update(self, y: float) -> float:
+        if len(self.values) == self.window:
+            oldest = self.values[0]
+            # Every remaining sample moves one place towards the start
+            self.sum_xy -= self.sum_y - oldest
+            self.sum_y -= oldest
+
+        self.values.append(y)
+        self.sum_y += y
+        self.sum_xy += (len(self.values) - 1) * y
+        self.updates += 1
+
+        if self.updates % self.recompute_every == 0:
+            self.sum_y = sum(self.values)
+            self.sum_xy = sum(x * v for x, v in enumerate(self.values))
+
+        n = len(self.values)
+        self.mean = self.sum_y / n
+        if n == 1:
+            self.value = y
+            return self.value
+
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        self.slope = (n * self.sum_xy - sum_x * self.sum_y) / (n * sum_xx - sum_x**2)
+
+        self.value = self.at(n - 1)
+        return self.value
+
+    def at(self, position: float) -> float:
+        # The fitted line at a position in the window, oldest is 0
+        return self.mean + self.slope * (position - (len(self.values) - 1) / 2)
+
+
+@define
+class StreamingRSI:
+    # Wilder's RSI, matching talipp's RSI(period, ...) once it has warmed up
+    period: int = field(validator=[validators.instance_of(int)])
+
+    previous: Optional[float] = field(default=None)
+    changes: int = field(default=0)
+    avg_gain: float = field(default=0.0)
+    avg_loss: float = field(default=0.0)
+    value: Optional[float] = field(default=None)
+
+    def update(self, x: float) -> Optional[float]:
+        if self.previous is None:
+            self.previous = x
+            return None
+
+        change = x - self.previous
+        self.previous = x
+        gain = max(change, 0.0)
+        loss = max(-change, 0.0)
+        self.changes += 1
+
+        if self.changes <= self.period:
+            # Simple average over the first period changes
+            self.avg_gain += gain / self.period
+            self.avg_loss += loss / self.period
+
+            if self.changes < self.period:
+                return None
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+
+        if self.avg_loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+        return self.value
+
+
+@define
+class SavgolRSI:
+    # RSI(period) of savgol_filter(samples, fit.window, 1), the series PLATO
+    # used to rebuild on every check. Between its ends that filter is a
+    # centred moving average, which doesn't change once its window is full,
+    # so those values go through the RSI as they arrive. savgol fits a line
+    # to the first and last window // 2 samples, the last ones are redone
+    # from the current fit on each read.
+    fit: RollingLinearFit = field(validator=[validators.instance_of(RollingLinearFit)])
+    period: int = field(validator=[validators.instance_of(int)])
+
+    settled: StreamingRSI = field(init=False)
+
+    def __attrs_post_init__(self):
+        self.settled = StreamingRSI(self.period)
+
+    def update(self):
+        # Call after each fit.update()
+        window = self.fit.window
+        half = window // 2
+
+        if self.fit.updates < window:
+            return
+
+        if self.fit.updates == window:
+            for position in range(half):
+                self.settled.update(self.fit.at(position))
+
+        # The mean of the last window samples is savgol's value at
+        # updates - half - 1, unless that's one of the fitted start values
+        if self.fit.updates - half - 1 >= half:
+            self.settled.update(self.fit.mean)
+
+    @property
+    def value(self) -> Optional[float]:
+        window = self.fit.window
+        if self.fit.updates < window:
+            return None
+
+        rsi = evolve(self.settled)
+        for position in range(window - window // 2, window):
+            rsi.update(self.fit.at(position))
+
+        return rsi.value
+
+
+@define
+class LatencyTrend:
+    # Smoothed latency and the RSI of that smoothed latency, for the short (14)
+    # and long (21) windows PLATO uses to speed up and slow down
+    short_fit: RollingLinearFit = field(factory=lambda: RollingLinearFit(14))
+    long_fit: RollingLinearFit = field(factory=lambda: RollingLinearFit(21))
+    short_rsi: SavgolRSI = field(
+        default=Factory(lambda self: SavgolRSI(self.short_fit, 14), takes_self=True)
+    )
+    long_rsi: SavgolRSI = field(
+        default=Factory(lambda self: SavgolRSI(self.long_fit, 21), takes_self=True)
+    )
+    samples: int = field(default=0)
+
+    def update(self, latency: float):
+        self.samples += 1
+        self.short_fit.update(latency)
+        self.long_fit.update(latency)
+        self.short_rsi.update()
+        self.long_rsi.update()
+
+
+@define
+class PlatoEstimator:
+    ours: LatencyTrend = field(factory=LatencyTrend)  # our gossip round trips
+    peers: LatencyTrend = field(factory=LatencyTrend)  # current_latency reported by peers
+
+    def add_our_latency(self, latency: float):
+        self.ours.update(latency)
+
+    def add_peer_latency(self, latency: float):
+        self.peers.update(latency)
@@ -0,0 +1,61 @@
+from attrs import define, field, validators
+import asyncio
+
+
+@define
+class QuorumCounter:
+    # Counts replies from the peers we sampled for one batch. Replies are
+    # counted as they arrive, so checking a threshold never builds a set.
+    sample: set = field(validator=[validators.instance_of(set)])
+    repliers: set = field(factory=set)  # sampled peers that have replied
+    count: int = field(factory=int)
+
+    # (threshold, future) pairs resolved once count reaches threshold
+    waiters: list = field(factory=list)
+
+    def add(self, peer_id: str):
+        if peer_id not in self.sample or peer_id in self.repliers:
+            return
+
+        self.repliers.add(peer_id)
+        self.count += 1
+
+        for threshold, future in self.waiters:
+            if self.count >= threshold and not future.done():
+                future.set_result(True)
+
+    def reached(self, threshold: int) -> bool:
+        return self.count >= threshold
+
+    async def wait(self, threshold: int, wait_timeout: float) -> bool:
+        if self.reached(threshold):
+            return True
+
+        waiter = (threshold, asyncio.get_running_loop().create_future())
+        self.waiters.append(waiter)
+
+        try:
+            return await asyncio.wait_for(waiter[1], wait_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiters.remove(waiter)
+
+
+@define
+class QuorumTracker:
+    # SBRB quorum state for one batch
+    echo: QuorumCounter = field(validator=[validators.instance_of(QuorumCounter)])
+    ready: QuorumCounter = field(validator=[validators.instance_of(QuorumCounter)])
+
+    @classmethod
+    def from_samples(cls, echo_sample: set, ready_sample: set):
+        return cls(QuorumCounter(echo_sample), QuorumCounter(ready_sample))
+
+    @property
+    def echo_count(self) -> int:
+        return self.echo.count
+
+    @property
+    def ready_count(self) -> int:
+        return self.ready.count
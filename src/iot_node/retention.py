@@ -0,0 +1,46 @@
+from attrs import define, field, validators
+from collections import OrderedDict
+import heapq
+import time
+
+
+@define
+class StateRetention:
+    # Decides when per-batch SBRB state can be dropped. Keys are scheduled once
+    # their gossip finishes (delivered or timed out) and expire retention_time
+    # seconds later. Expired keys are remembered as tombstones so late
+    # duplicates can still be rejected without keeping the whole batch around.
+    retention_time: float = field()
+    max_tombstones: int = field(validator=[validators.instance_of(int)])
+
+    expiry_heap: list = field(factory=list)  # (expiry time, key)
+    tombstones: OrderedDict = field(factory=OrderedDict)  # key -> None, oldest first
+    expired_count: int = field(factory=int)
+
+    def schedule(self, key: bytes):
+        heapq.heappush(self.expiry_heap, (time.monotonic() + self.retention_time, key))
+
+    def pop_expired(self) -> list:
+        now = time.monotonic()
+        expired = []
+
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            _, key = heapq.heappop(self.expiry_heap)
+            expired.append(key)
+            self.add_tombstone(key)
+
+        self.expired_count += len(expired)
+        return expired
+
+    def add_tombstone(self, key: bytes):
+        self.tombstones[key] = None
+        self.tombstones.move_to_end(key)
+
+        while len(self.tombstones) > self.max_tombstones:
+            self.tombstones.popitem(last=False)
+
+    def is_tombstoned(self, key: bytes) -> bool:
+        return key in self.tombstones
+
+    def pending(self) -> int:
+        return len(self.expiry_heap)
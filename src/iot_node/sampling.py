@@ -0,0 +1,187 @@
+from attrs import Factory, define, field
+from scipy.stats import poisson, norm
+import numpy as np
+import random
+
+ALGORITHMS = ["normal", "random", "poisson", "latency"]
+
+POISSON_RATE = 5
+# Every peer keeps at least this much weight, so k distinct peers can always
+# be drawn even when the distribution puts almost nothing on most indices
+MIN_WEIGHT = 1e-9
+
+
+def normal_index_weights(num_peers: int) -> np.ndarray:
+    # P(int(X) % n == i) for X ~ N((n - 1) / 2, sqrt(n)), the distribution
+    # select_nodes used to draw from
+    mean = (num_peers - 1) / 2
+    std_dev = np.sqrt(num_peers)
+    low = int(np.floor(mean - 8 * std_dev)) - 1
+    high = int(np.ceil(mean + 8 * std_dev)) + 1
+
+    values = np.arange(low, high + 1)
+    # int() truncates towards zero, so 0 covers (-1, 1)
+    lower = np.where(values > 0, values, values - 1).astype(float)
+    upper = np.where(values < 0, values, values + 1).astype(float)
+    probabilities = norm.cdf(upper, mean, std_dev) - norm.cdf(lower, mean, std_dev)
+
+    weights = np.zeros(num_peers)
+    np.add.at(weights, values % num_peers, probabilities)
+    return weights
+
+
+def poisson_index_weights(num_peers: int) -> np.ndarray:
+    # P(Poisson(rate) % n == i)
+    values = np.arange(int(poisson.ppf(1 - 1e-12, POISSON_RATE)) + 1)
+
+    weights = np.zeros(num_peers)
+    np.add.at(weights, values % num_peers, poisson.pmf(values, POISSON_RATE))
+    return weights
+
+
+def fill_unknown(values: np.ndarray, default: float) -> np.ndarray:
+    # Peers we haven't measured yet are treated like a typical peer
+    known = values[~np.isnan(values)]
+    return np.nan_to_num(values, nan=np.median(known) if len(known) else default)
+
+
+def normalise(weights: np.ndarray) -> np.ndarray:
+    weights = np.maximum(weights, MIN_WEIGHT)
+    return weights / weights.sum()
+
+
+@define
+class PeerSampler:
+    # Picks k distinct peers, weighted ones in one vectorised draw. The peer
+    # ids and the per-algorithm weights are cached until the peer set changes.
+    rng: np.random.Generator = field(factory=np.random.default_rng)
+    # Seeded from rng, random.sample is O(k) where a numpy draw is O(n)
+    uniform_rng: random.Random = field(
+        default=Factory(
+            lambda self: random.Random(int(self.rng.integers(2**63))), takes_self=True
+        )
+    )
+    peer_ids: np.ndarray = field(factory=lambda: np.empty(0, dtype=object))
+    peer_list: list = field(factory=list)  # peer_ids as a list, for random.sample
+    weights: dict = field(factory=dict)  # algorithm -> index weights
+
+    # Per peer health for the 'latency' algorithm, lined up with peer_ids.
+    # nan until we've heard from the peer.
+    positions: dict = field(factory=dict)  # peer id -> index in peer_ids
+    rtt: np.ndarray = field(factory=lambda: np.empty(0))  # EWMA of request round trips
+    reported_latency: np.ndarray = field(factory=lambda: np.empty(0))  # EWMA of their current_latency
+    missed: np.ndarray = field(factory=lambda: np.empty(0))  # EWMA of recently_missed and timeouts
+    ewma_alpha: float = field(default=0.2)
+    exploration: float = field(default=0.2)  # share of the draw that stays uniform
+    reported_latency_weight: float = field(default=0.1)  # seconds of cost per second of reported latency
+    missed_penalty: float = field(default=4.0)  # cost multiplier for a peer that always misses
+
+    def set_peers(self, peer_ids):
+        peer_ids = list(peer_ids)
+        rtt = np.full(len(peer_ids), np.nan)
+        reported_latency = np.full(len(peer_ids), np.nan)
+        missed = np.zeros(len(peer_ids))
+
+        # Keep what we know about peers we already had
+        for new_position, peer_id in enumerate(peer_ids):
+            old_position = self.positions.get(peer_id)
+            if old_position is not None:
+                rtt[new_position] = self.rtt[old_position]
+                reported_latency[new_position] = self.reported_latency[old_position]
+                missed[new_position] = self.missed[old_position]
+
+        self.peer_ids = np.array(peer_ids, dtype=object)
+        self.peer_list = peer_ids
+        self.positions = {peer_id: i for i, peer_id in enumerate(peer_ids)}
+        self.rtt = rtt
+        self.reported_latency = reported_latency
+        self.missed = missed
+        self.weights.clear()
+
+    def ewma(self, values: np.ndarray, peer_id: str, sample: float):
+        position = self.positions.get(peer_id)
+        if position is None:
+            return
+
+        if np.isnan(values[position]):
+            values[position] = sample
+        else:
+            values[position] += self.ewma_alpha * (sample - values[position])
+
+    def record_rtt(self, peer_id: str, rtt: float):
+        self.ewma(self.rtt, peer_id, rtt)
+
+    def record_congestion(self, peer_id: str, current_latency: float, recently_missed: bool):
+        self.ewma(self.reported_latency, peer_id, current_latency)
+        self.ewma(self.missed, peer_id, float(recently_missed))
+
+    def record_timeout(self, peer_id: str, waited: float):
+        self.ewma(self.rtt, peer_id, waited)
+        self.ewma(self.missed, peer_id, 1.0)
+
+    def latency_weights(self) -> np.ndarray:
+        # Faster, less congested peers get more weight. The uniform share
+        # means every peer keeps at least exploration / n of the draw.
+        cost = fill_unknown(self.rtt, 1.0) + self.reported_latency_weight * fill_unknown(
+            self.reported_latency, 0.0
+        )
+        cost = np.maximum(cost, 1e-3) * (1 + self.missed_penalty * self.missed)
+
+        health = 1 / cost
+        health = health / health.sum()
+
+        return (1 - self.exploration) * health + self.exploration / len(self.peer_ids)
+
+    def peer_statistics(self) -> dict:
+        weights = self.latency_weights() if len(self.peer_ids) else []
+
+        return {
+            peer_id: {
+                "rtt": None if np.isnan(self.rtt[i]) else float(self.rtt[i]),
+                "reported_latency": None
+                if np.isnan(self.reported_latency[i])
+                else float(self.reported_latency[i]),
+                "missed": float(self.missed[i]),
+                "weight": float(weights[i]),
+            }
+            for i, peer_id in enumerate(self.peer_ids)
+        }
+
+    def index_weights(self, algorithm: str) -> np.ndarray:
+        if algorithm == "latency":
+            # Changes with every measurement, so never cached
+            return self.latency_weights()
+
+        if algorithm not in self.weights:
+            num_peers = len(self.peer_ids)
+
+            if algorithm == "normal":
+                weights = normalise(normal_index_weights(num_peers))
+            elif algorithm == "poisson":
+                weights = normalise(poisson_index_weights(num_peers))
+            else:
+                weights = None  # uniform
+
+            self.weights[algorithm] = weights
+
+        return self.weights[algorithm]
+
+    def sample(self, algorithm: str, k: int) -> set:
+        assert algorithm in ALGORITHMS
+        return self.sample_weighted(self.index_weights(algorithm), k)
+
+    def sample_weighted(self, weights, k: int) -> set:
+        # weights line up with peer_ids, None draws uniformly
+        num_peers = len(self.peer_ids)
+        k = min(k, num_peers)
+        if k == 0:
+            return set()
+
+        if weights is None:
+            return set(self.uniform_rng.sample(self.peer_list, k))
+
+        # Exponential keys divided by the weights, keeping the k smallest,
+        # samples k peers without replacement in one vectorised pass
+        keys = self.rng.exponential(size=num_peers) / weights
+
+        return set(self.peer_ids[np.argpartition(keys, k - 1)[:k]])
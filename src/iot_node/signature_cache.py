@@ -0,0 +1,39 @@
+from attrs import define, field, validators
+from collections import OrderedDict
+import time
+
+
+@define
+class VerifiedSignatureCache:
+    # LRU of (signed bytes, signature) pairs that already passed verification.
+    # Entries expire after ttl seconds, there's no point remembering a batch
+    # after its gossip has timed out.
+    max_entries: int = field(validator=[validators.instance_of(int)])
+    ttl: float = field()
+
+    entries: OrderedDict = field(factory=OrderedDict)  # key -> expiry time
+    hits: int = field(factory=int)
+    misses: int = field(factory=int)
+
+    def contains(self, key: tuple) -> bool:
+        expiry = self.entries.get(key)
+
+        if expiry is None:
+            self.misses += 1
+            return False
+
+        if expiry < time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return False
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def add(self, key: tuple):
+        self.entries[key] = time.monotonic() + self.ttl
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
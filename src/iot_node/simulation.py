@@ -0,0 +1,285 @@
+from attrs import define, frozen, field, validators
+from aiozmq.core import create_zmq_connection
+from typing import Optional
+import asyncio
+import aiozmq
+import random
+import resource
+import shutil
+import tempfile
+import time
+import zmq
+
+from .node import Node
+from .message_classes import Gossip
+from .at2_classes import AT2Configuration
+from .connection_pool import create_stream
+from .address_plan import AddressPlan
+
+
+@frozen
+class NetworkProfile:
+    latency: float = field(default=0.0)  # one way, in seconds
+    jitter: float = field(default=0.0)  # up to this much extra latency, in seconds
+    loss: float = field(default=0.0)  # chance a write is dropped
+    bandwidth: Optional[float] = field(default=None)  # bytes per second out of each socket
+
+    @loss.validator
+    def check_loss(self, attribute, value):
+        if not 0 <= value < 1:
+            raise ValueError("loss must be in [0, 1)")
+
+
+class SimulatedStream(aiozmq.ZmqStream):
+    # A real ZMQ stream whose writes are delayed, dropped and rate limited per
+    # the network profile. Writes leave in order, like over a TCP connection.
+    def __init__(self, network, loop, **kwargs):
+        super().__init__(loop, **kwargs)
+        self.network = network
+        self.link_free_at = 0.0  # when the link finishes sending what's queued
+        self.last_delivery = 0.0
+
+    def write(self, msg):
+        network = self.network
+        profile = network.profile
+        network.writes += 1
+
+        if profile.loss and network.rng.random() < profile.loss:
+            network.dropped += 1
+            return
+
+        now = self._loop.time()
+        size = sum(len(frame) for frame in msg)
+        network.bytes_sent += size
+
+        if profile.bandwidth:
+            self.link_free_at = max(self.link_free_at, now) + size / profile.bandwidth
+            sent_at = self.link_free_at
+        else:
+            sent_at = now
+
+        delay = profile.latency + profile.jitter * network.rng.random()
+        self.last_delivery = max(self.last_delivery, sent_at + delay)
+
+        if self.last_delivery <= now:
+            super().write(msg)
+        else:
+            self._loop.call_at(self.last_delivery, self.deliver, msg)
+
+    def deliver(self, msg):
+        # The socket may have been closed while the write was in flight
+        if self._transport is not None and not self._transport._closing:
+            super().write(msg)
+
+
+@define
+class SimulatedNetwork:
+    # Stream factory for Node.stream_factory that puts every socket on a
+    # simulated link. Works over any ZMQ address.
+    profile: NetworkProfile = field(factory=NetworkProfile)
+    rng: random.Random = field(factory=random.Random)
+
+    writes: int = field(default=0)
+    dropped: int = field(default=0)
+    bytes_sent: int = field(default=0)
+
+    async def __call__(self, zmq_type, bind=None, connect=None) -> aiozmq.ZmqStream:
+        loop = asyncio.get_running_loop()
+        stream = SimulatedStream(self, loop)
+
+        await create_zmq_connection(
+            lambda: stream._protocol, zmq_type, bind=bind, connect=connect, loop=loop
+        )
+
+        return stream
+
+    def statistics(self) -> dict:
+        return {
+            "writes": self.writes,
+            "dropped": self.dropped,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+@define
+class Simulation:
+    # Runs num_nodes Nodes in this event loop. Each node is only told about
+    # `seeds` routers and finds the rest of the cluster through peer discovery.
+    # There's no inproc:// transport, aiozmq reads one message per wakeup of
+    # ZMQ's edge triggered fd and inproc SUB sockets stop waking up.
+    num_nodes: int = field(validator=[validators.instance_of(int)])
+    at2_config: AT2Configuration = field(
+        validator=[validators.instance_of(AT2Configuration)]
+    )
+    transport: str = field(
+        default="ipc", validator=[validators.in_(["ipc", "tcp"])]
+    )
+    network: Optional[NetworkProfile] = field(default=None)  # None is a plain ZMQ network
+    base_port: int = field(default=20001)
+    seeds: int = field(default=1, validator=[validators.ge(1)])
+    seed: Optional[int] = field(default=None)  # seeds the seed choice and simulated link rng
+    node_kwargs: dict = field(factory=dict)
+    ready_timeout: float = field(default=60)
+    stall_timeout: float = field(default=15)  # give up once discovery makes no progress for this long
+
+    nodes: list = field(factory=list)
+    simulated_network: Optional[SimulatedNetwork] = field(default=None)
+    ipc_dir: Optional[str] = field(default=None)
+    started: float = field(default=None)
+    sent_gossips: int = field(default=0)
+
+    async def start(self):
+        rng = random.Random(self.seed)
+
+        if self.network is None:
+            stream_factory = create_stream
+        else:
+            self.simulated_network = SimulatedNetwork(
+                self.network, random.Random(rng.random())
+            )
+            stream_factory = self.simulated_network
+
+        if self.transport == "ipc":
+            self.ipc_dir = tempfile.mkdtemp(prefix="racer-")
+
+        # Every node's sockets share the default context, which only allows
+        # 1023. Has to be set before the first socket is created. Each node
+        # keeps a socket per peer, so the process needs more files than the
+        # usual soft limit too.
+        context = zmq.Context.instance()
+        context.set(zmq.MAX_SOCKETS, context.get(zmq.SOCKET_LIMIT))
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+        plan = AddressPlan(
+            self.transport,
+            router_port=self.base_port,
+            publisher_port=self.base_port + 1000,
+            ipc_dir=self.ipc_dir,
+        )
+        addresses = [
+            (plan.router(i), plan.publisher(i)) for i in range(self.num_nodes)
+        ]
+
+        for router_bind, publisher_bind in addresses:
+            node = Node(
+                router_bind=router_bind,
+                publisher_bind=publisher_bind,
+                at2_config=self.at2_config,
+                stream_factory=stream_factory,
+                **self.node_kwargs,
+            )
+            await node.init_sockets()
+            self.nodes.append(node)
+
+        await asyncio.gather(*[node.start() for node in self.nodes])
+
+        routers = [router for router, _ in addresses]
+        for i, node in enumerate(self.nodes):
+            # The next node's router first, so the seeds form a ring and every
+            # node can reach the rest. Random seeds alone often split the cluster.
+            others = routers[i + 1 :] + routers[:i]
+            seeds = others[:1] + rng.sample(others[1:], min(self.seeds - 1, len(others[1:])))
+            asyncio.create_task(
+                node.peer_discovery(seeds, expected_peers=len(others))
+            )
+
+        await self.wait_until_ready()
+
+        for node in self.nodes:
+            await node.subscribe_to_all_peers_and_topics()
+
+        self.started = time.monotonic()
+
+    async def wait_until_ready(self):
+        # Fails once no node has learned a peer for stall_timeout, a cluster
+        # that stopped discovering peers won't finish before ready_timeout
+        started = time.monotonic()
+        progressed = started
+        peer_counts = None
+
+        while not all(node.cluster_ready.is_set() for node in self.nodes):
+            now = time.monotonic()
+            counts = sorted(len(node.peers) for node in self.nodes)
+
+            if counts != peer_counts:
+                peer_counts = counts
+                progressed = now
+            elif now - progressed > self.stall_timeout:
+                raise TimeoutError(
+                    f"Peer discovery stalled for {self.stall_timeout}s, nodes know "
+                    f"{counts} peers, each needs {self.num_nodes - 1}"
+                )
+
+            if now - started > self.ready_timeout:
+                raise TimeoutError(
+                    f"Cluster not ready after {self.ready_timeout}s, nodes know "
+                    f"{counts} peers, each needs {self.num_nodes - 1}"
+                )
+
+            await asyncio.sleep(0.5)
+
+    async def run_load(self, duration: float, rate: float, padding: int = 10**935):
+        # Submits about `rate` gossips a second across random nodes
+        rng = random.Random(self.seed)
+        end = time.monotonic() + duration
+
+        while time.monotonic() < end:
+            node = rng.choice(self.nodes)
+            # Batches are content addressed, identical gossips sent on their own
+            # would share a batch id and only be delivered once
+            await node.submit(
+                Gossip(
+                    message_type="Gossip",
+                    timestamp=int(time.time()),
+                    padding=padding + self.sent_gossips,
+                )
+            )
+            self.sent_gossips += 1
+
+            await asyncio.sleep(rng.expovariate(rate))
+
+    async def drain(self, timeout: float):
+        # Wait until every node has delivered every batch, or for timeout
+        end = time.monotonic() + timeout
+
+        while time.monotonic() < end:
+            sent = sum(node.sent_gossips for node in self.nodes)
+            delivered = sum(node.delivered_gossips for node in self.nodes)
+
+            if delivered >= sent * self.num_nodes and not any(
+                node.pending_gossips or node.signing_batches for node in self.nodes
+            ):
+                break
+
+            await asyncio.sleep(0.5)
+
+    def results(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        delivered = sum(node.delivered_gossips for node in self.nodes)
+        latencies = [latency for node in self.nodes for latency in node.our_latency]
+
+        results = {
+            "nodes": self.num_nodes,
+            "transport": self.transport,
+            "elapsed": elapsed,
+            "submitted_gossips": self.sent_gossips,
+            "sent_batches": sum(node.sent_gossips for node in self.nodes),
+            "delivered_batches": delivered,
+            "delivered_per_second": delivered / elapsed,
+            "mean_round_trip": sum(latencies) / len(latencies) if latencies else None,
+            "time_to_ready": max(node.time_to_ready or 0 for node in self.nodes),
+        }
+
+        if self.simulated_network is not None:
+            results["network"] = self.simulated_network.statistics()
+
+        return results
+
+    def stop(self):
+        for node in self.nodes:
+            node.stop()
+
+        if self.ipc_dir is not None:
+            shutil.rmtree(self.ipc_dir, ignore_errors=True)
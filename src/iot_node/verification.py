@@ -0,0 +1,181 @@
+from attrs import define, field, validators
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+from .crypto import SIGNATURE_SCHEMES
+from .crypto import get_signature_scheme
+import asyncio
+import multiprocessing
+
+
+def verify_signature_batch(items: list, scheme: str = "p256") -> list:
+    # Runs in a worker process. Each item is (creator_bytes, sender_bytes,
+    # creator_signature, sender_signature, creator_ecdsa, sender_ecdsa, creator_verified)
+    signatures = get_signature_scheme(scheme)
+    results = []
+
+    for (
+        creator_bytes,
+        sender_bytes,
+        creator_sig,
+        sender_sig,
+        creator_ecdsa,
+        sender_ecdsa,
+        creator_verified,
+    ) in items:
+        creator_sig_check = creator_verified or signatures.verify(
+            creator_sig, creator_bytes, creator_ecdsa
+        )
+
+        results.append(
+            creator_sig_check
+            and signatures.verify(sender_sig, sender_bytes, sender_ecdsa)
+        )
+
+    return results
+
+
+@define
+class PendingVerification:
+    bm = field()
+    creator_signature: tuple = field(converter=tuple)
+    sender_signature: tuple = field(converter=tuple)
+    creator_verified: bool = field(default=False)  # creator part was found in the cache
+    result: asyncio.Future = field(
+        factory=lambda: asyncio.get_running_loop().create_future()
+    )  # set to whether the signatures checked out
+
+    def as_work_item(self) -> tuple:
+        return (
+            self.bm.get_creator_bytes(),
+            self.bm.get_sender_bytes(),
+            self.creator_signature,
+            self.sender_signature,
+            self.bm.creator_ecdsa,
+            self.bm.sender_ecdsa,
+            self.creator_verified,
+        )
+
+
+@define
+class VerificationPipeline:
+    # Collects BatchedMessages for a short window, verifies them on a process
+    # pool and hands them back in arrival order.
+    on_verified: Callable = field()
+    on_failed: Callable = field()
+    batch_window: float = field(default=0.005)  # seconds to wait for more frames
+    max_batch_size: int = field(default=64)
+    workers: int = field(default=2, validator=[validators.instance_of(int)])
+    signature_scheme: str = field(
+        default="p256", validator=[validators.in_(list(SIGNATURE_SCHEMES))]
+    )
+    logger = field(default=None)
+
+    queue: asyncio.Queue = field(factory=asyncio.Queue)
+    executor: ProcessPoolExecutor = field(default=None)
+    task: asyncio.Task = field(default=None)
+
+    def start(self):
+        self.start_executor()
+        self.task = asyncio.create_task(self.run())
+        self.task.add_done_callback(self.stopped)
+
+    def start_executor(self):
+        # spawn, so workers don't inherit the parents zmq sockets and event loop
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def stopped(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+
+        if self.logger is not None:
+            self.logger.error("Verification pipeline stopped", exc_info=task.exception())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(
+        self,
+        bm,
+        creator_signature: tuple,
+        sender_signature: tuple,
+        creator_verified: bool = False,
+    ) -> asyncio.Future:
+        pending = PendingVerification(
+            bm, creator_signature, sender_signature, creator_verified
+        )
+        self.queue.put_nowait(pending)
+
+        return pending.result
+
+    async def next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.batch_window
+
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def verify(self, batch: list) -> list:
+        loop = asyncio.get_running_loop()
+        items = [pending.as_work_item() for pending in batch]
+
+        # Split the batch so every worker gets a share
+        chunk_size = -(-len(items) // self.workers)
+        chunks = [
+            items[i : i + chunk_size] for i in range(0, len(items), chunk_size)
+        ]
+
+        chunk_results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    self.executor, verify_signature_batch, chunk, self.signature_scheme
+                )
+                for chunk in chunks
+            ]
+        )
+
+        return [result for results in chunk_results for result in results]
+
+    async def run(self):
+        while True:
+            batch = await self.next_batch()
+
+            try:
+                results = await self.verify(batch)
+            except BrokenProcessPool:
+                # A worker died and took the pool down with it. Says nothing
+                # about the signatures, so the batch is checked again on a new
+                # pool. Anything else is a bug and stops the pipeline.
+                if self.logger is not None:
+                    self.logger.error("Verification workers died, restarting the pool")
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.start_executor()
+                results = await self.verify(batch)
+
+            for pending, verified in zip(batch, results):
+                if verified:
+                    self.on_verified(pending.bm, pending.creator_signature)
+                else:
+                    self.on_failed(pending.bm)
+                pending.result.set_result(verified)
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uvloop
+
+from iot_node.address_plan import AddressPlan
+from main import get_at2_config, run_node
+from logs import get_logger
+
+logging = get_logger("launcher")
+
+
+def parse_cpus(cpus: str) -> list:
+    # "0-3,6" -> [0, 1, 2, 3, 6]
+    parsed = []
+    for part in cpus.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            parsed.extend(range(int(first), int(last) + 1))
+        else:
+            parsed.append(int(part))
+    return parsed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run many nodes natively, sharded over worker processes"
+    )
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--loops-per-process", type=int, default=1)
+    parser.add_argument("--pin", action="store_true", help="pin each worker to one CPU")
+    parser.add_argument("--cpus", type=parse_cpus, default=None, help="CPUs to pin to, e.g. 0-3,6")
+    parser.add_argument("--transport", choices=["tcp", "ipc"], default="tcp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--router-port", type=int, default=20001)
+    parser.add_argument("--publisher-port", type=int, default=21001)
+    parser.add_argument("--ipc-dir", default="/tmp/racer")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    return parser.parse_args()
+
+
+def run_loop(node_ids: list, num_nodes: int, plan: AddressPlan):
+    loop = uvloop.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def run_nodes():
+        await asyncio.gather(
+            *[run_node(node_id, num_nodes, plan, get_at2_config()) for node_id in node_ids]
+        )
+
+    try:
+        loop.run_until_complete(run_nodes())
+    finally:
+        loop.close()
+
+
+def worker(node_ids: list, num_nodes: int, plan: AddressPlan, loops: int, cpu: int):
+    # Shares nothing with the other workers, each loop owns its own nodes
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+
+    logging.warning(f"Worker {os.getpid()} running nodes {node_ids} on CPU {cpu}")
+
+    threads = [
+        threading.Thread(
+            target=run_loop, args=(node_ids[i::loops], num_nodes, plan), daemon=True
+        )
+        for i in range(loops)
+        if node_ids[i::loops]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main():
+    args = parse_args()
+    num_nodes = args.nodes
+
+    plan = AddressPlan(
+        args.transport,
+        host=args.host,
+        router_port=args.router_port,
+        publisher_port=args.publisher_port,
+        ipc_dir=args.ipc_dir,
+    )
+    if args.transport == "ipc":
+        os.makedirs(args.ipc_dir, exist_ok=True)
+
+    node_ids = list(range(num_nodes))
+    processes = min(args.processes, len(node_ids))
+    cpus = args.cpus or (list(range(os.cpu_count())) if args.pin else None)
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=worker,
+            args=(
+                node_ids[i::processes],
+                num_nodes,
+                plan,
+                args.loops_per_process,
+                cpus[i % len(cpus)] if cpus else None,
+            ),
+        )
+        for i in range(processes)
+    ]
+
+    for process in workers:
+        process.start()
+
+    def stop(*_):
+        for process in workers:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    started = time.monotonic()
+    while any(process.is_alive() for process in workers):
+        if args.duration is not None and time.monotonic() - started > args.duration:
+            stop()
+        time.sleep(1)
+
+    for process in workers:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import random
 from iot_node.node import Node
 from iot_node.message_classes import Gossip
 from iot_node.at2_classes import AT2Configuration
+from iot_node.address_plan import AddressPlan
 from logs import get_logger
 
 logging = get_logger("runner")
@@ -21,68 +22,60 @@ def get_node_port():
     return int(node_port)
 
 
-async def main():
-    NUM_NODES = 10
+def get_num_nodes():
+    return int(os.getenv("NUM_NODES", 10))
+
 
+def get_at2_config():
     # at2_config = AT2Configuration(10, 10, 10, 6, 8, 9)
     # at2_config = AT2Configuration(7, 7, 7, 5, 6, 7)
-    at2_config = AT2Configuration(6, 6, 6, 4, 5, 6)
+    return AT2Configuration(6, 6, 6, 4, 5, 6)
 
-    docker_node_id = get_node_port()
 
-    router_list = []
+async def main():
+    await run_node(get_node_port(), get_num_nodes(), AddressPlan(), get_at2_config())
+
 
-    for i in range(NUM_NODES):
-        if i != docker_node_id:
-            router_list.append(f"tcp://127.0.0.1:{20001+i}")
+async def run_node(
+    node_id: int, num_nodes: int, plan: AddressPlan, at2_config: AT2Configuration
+):
+    router_list = [plan.router(i) for i in range(num_nodes) if i != node_id]
 
     this_node = Node(
-        router_bind=f"tcp://127.0.0.1:{20001 + docker_node_id}",
-        publisher_bind=f"tcp://127.0.0.1:{21001 + docker_node_id}",
+        router_bind=plan.router(node_id),
+        publisher_bind=plan.publisher(node_id),
         at2_config=at2_config,
     )
 
-    logging.warning(f"Spinning up {docker_node_id}")
+    logging.warning(f"Spinning up {node_id}")
     await this_node.init_sockets()
     await this_node.start()
 
-    logging.warning(f"Running peer discovery on {docker_node_id}...")
-    await this_node.peer_discovery(router_list)
-
-    # Wait til we find all our peers
-    while len(list(this_node.peers.keys())) != len(router_list):
-        logging.warning(
-            f"Dont have all peers GOT: {len(list(this_node.peers.keys()))} NEED: {len(router_list)} "
-        )
-
-        await asyncio.sleep(1)
-
-    # Wait til we cache all our peers sockets
-    while len(list(this_node.sockets.keys())) != len(router_list):
-        logging.warning(
-            f"Dont have all sockets GOT: {len(list(this_node.sockets.keys()))} NEED: {len(router_list)} "
-        )
+    logging.warning(f"Running peer discovery on {node_id}...")
+    asyncio.create_task(this_node.peer_discovery(router_list))
 
-        await asyncio.sleep(1)
+    # Wait til we find and connect to all our peers
+    await this_node.cluster_ready.wait()
 
     logging.warning(
-        f"All nodes ready {len(list(this_node.peers.keys()))} / {len(router_list)} "
+        f"All nodes ready {len(list(this_node.peers.keys()))} / {len(router_list)} in {this_node.time_to_ready}s"
     )
 
     await this_node.subscribe_to_all_peers_and_topics()
 
+    # Give peers that became ready after us time to subscribe
     await asyncio.sleep(5)
 
     pad = 10**935
     for i in range(1, 1000):
         # Randomize the process of sending commands with a certain probability
         if random.random() < 0.5:  # Adjust probability as needed
-            # logging.error(f"Node {docker_node_id} sending commands at iteration {i}")
+            # logging.error(f"Node {node_id} sending commands at iteration {i}")
             for _ in range(random.randint(5, 15)):
                 gos = Gossip(
                     message_type="Gossip", timestamp=int(time.time()), padding=pad
                 )
-                this_node.command(gos)
+                await this_node.submit(gos)
 
         await asyncio.sleep(random.randint(1, 2))
 
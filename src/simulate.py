@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import uvloop
+
+from iot_node.simulation import NetworkProfile
+from iot_node.simulation import Simulation
+from iot_node.at2_classes import AT2Configuration
+from logs import get_logger
+
+logging = get_logger("simulate")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run a cluster of nodes in one process over ipc or tcp sockets"
+    )
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--transport", choices=["ipc", "tcp"], default="ipc")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--rate", type=float, default=20, help="gossips per second")
+    parser.add_argument("--drain", type=float, default=30, help="seconds to wait for deliveries")
+    parser.add_argument("--seeds", type=int, default=1, help="routers each node starts with")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--at2", type=int, nargs=6, default=[6, 6, 6, 4, 5, 6], metavar="N",
+        help="AT2Configuration sample sizes and thresholds",
+    )
+    parser.add_argument("--latency", type=float, default=None, help="one way, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=None, help="bytes per second per socket")
+    parser.add_argument(
+        "--node-kwargs", type=json.loads, default={},
+        help='JSON of extra Node arguments, e.g. \'{"transport_mode": "dealer"}\'',
+    )
+    return parser.parse_args()
+
+
+async def main(args):
+    network = None
+    if args.latency is not None or args.loss or args.bandwidth is not None:
+        network = NetworkProfile(
+            latency=args.latency or 0.0,
+            jitter=args.jitter,
+            loss=args.loss,
+            bandwidth=args.bandwidth,
+        )
+
+    simulation = Simulation(
+        args.nodes,
+        AT2Configuration(*args.at2),
+        transport=args.transport,
+        network=network,
+        seeds=args.seeds,
+        seed=args.seed,
+        node_kwargs=args.node_kwargs,
+    )
+
+    logging.warning(f"Starting {args.nodes} nodes over {args.transport}")
+    await simulation.start()
+
+    await simulation.run_load(args.duration, args.rate)
+    await simulation.drain(args.drain)
+
+    results = simulation.results()
+    simulation.stop()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    uvloop.install()
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.batching import AdaptiveFlushScheduler  # noqa: E402
+
+
+def recording_scheduler(interval: float, **kwargs) -> tuple:
+    flushed = []
+
+    async def flush():
+        flushed.append(asyncio.get_running_loop().time())
+
+    return AdaptiveFlushScheduler(flush, interval, **kwargs), flushed
+
+
+@pytest.mark.asyncio
+async def test_flushes_every_interval():
+    scheduler, flushed = recording_scheduler(0.05)
+    scheduler.start()
+
+    try:
+        await asyncio.sleep(0.28)
+    finally:
+        scheduler.stop()
+
+    assert 4 <= len(flushed) <= 6
+    assert scheduler.achieved_interval == pytest.approx(0.05, abs=0.02)
+    assert scheduler.size_flushes == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "limits, notifications",
+    [
+        ({"max_pending_count": 3}, [(1, 0)] * 3),
+        ({"max_pending_bytes": 100}, [(1, 60), (1, 60)]),
+    ],
+)
+async def test_flushes_early_once_enough_is_pending(limits, notifications):
+    scheduler, flushed = recording_scheduler(60, **limits)
+    scheduler.start()
+    await asyncio.sleep(0.01)
+
+    try:
+        for count, size in notifications[:-1]:
+            scheduler.notify(count, size)
+            await asyncio.sleep(0.01)
+        assert flushed == []
+
+        scheduler.notify(*notifications[-1])
+        await asyncio.sleep(0.01)
+    finally:
+        scheduler.stop()
+
+    assert len(flushed) == 1
+    assert scheduler.size_flushes == 1
+    assert scheduler.pending_count == scheduler.pending_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_new_interval_applies_straight_away():
+    scheduler, flushed = recording_scheduler(60)
+    scheduler.start()
+    await asyncio.sleep(0.01)
+
+    try:
+        scheduler.set_interval(0.02)
+        await asyncio.sleep(0.05)
+    finally:
+        scheduler.stop()
+
+    assert flushed
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_logged_and_scheduling_continues(caplog):
+    calls = []
+
+    async def flush():
+        calls.append(None)
+        raise RuntimeError("boom")
+
+    scheduler = AdaptiveFlushScheduler(
+        flush, 0.01, logger=logging.getLogger("test_batching")
+    )
+    scheduler.start()
+
+    try:
+        await asyncio.sleep(0.06)
+    finally:
+        scheduler.stop()
+
+    assert len(calls) >= 2
+    assert "Flush failed" in caplog.text
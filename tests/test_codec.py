@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.codec import BINARY_CODEC  # noqa: E402
+from iot_node.codec import CODECS  # noqa: E402
+from iot_node.codec import DECODE_ERRORS  # noqa: E402
+from iot_node.codec import JSON_CODEC  # noqa: E402
+from iot_node.codec import KIND_ECHO  # noqa: E402
+from iot_node.codec import BinaryReader  # noqa: E402
+from iot_node.codec import BinaryWriter  # noqa: E402
+from iot_node.message_classes import BatchedMessages  # noqa: E402
+from iot_node.message_classes import Echo  # noqa: E402
+from iot_node.message_classes import Gossip  # noqa: E402
+from iot_node.message_classes import Response  # noqa: E402
+
+KEY = (2**255 + 12345, 67890)
+SIGNATURE = (2**200 + 1, 2**100 + 2)
+BATCH_ID = "ab" * 32
+
+
+def batched_message() -> BatchedMessages:
+    return BatchedMessages(
+        message_type="BatchedMessage",
+        creator_bls="q" * 64,
+        creator_ecdsa=KEY,
+        sender_ecdsa=KEY,
+        messages=(
+            Gossip(message_type="Gossip", timestamp=1700000000, padding=42),
+            Gossip(message_type="Gossip", timestamp=1700000001, padding=0),
+        ),
+        aggregated_bls_signature="111",
+        merkle_root="cd" * 32,
+        vector_clock=(("a1b2", 3), ("c3d4", 0)),
+    )
+
+
+def echo() -> Echo:
+    return Echo(message_type="EchoSubscribe", batched_messages_hash=BATCH_ID, creator=KEY)
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+@pytest.mark.parametrize("message", [batched_message(), echo()], ids=["bm", "echo"])
+def test_message_round_trip(codec, message):
+    decoded = codec.decode_message(codec.encode_message(message))
+
+    assert type(decoded) is type(message)
+    assert decoded.message_type == message.message_type
+    if isinstance(message, BatchedMessages):
+        assert decoded.get_creator_bytes() == message.get_creator_bytes()
+        assert decoded.batch_id == message.batch_id
+    else:
+        assert decoded.get_echo_bytes() == message.get_echo_bytes()
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+def test_signature_round_trip(codec):
+    assert codec.decode_signature(codec.encode_signature(SIGNATURE)) == SIGNATURE
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+@pytest.mark.parametrize("signed", [True, False])
+def test_responses_round_trip(codec, signed):
+    responses = [
+        Response(message_type="EchoResponse", topic=BATCH_ID, creator=KEY),
+        Response(message_type="ReadyResponse", topic="héllo wörld", creator=KEY),
+    ]
+    signatures = [SIGNATURE, SIGNATURE] if signed else None
+
+    frames = codec.encode_responses(responses, signatures)
+    frames, batch_sig = codec.split_batch_signature(frames)
+    decoded = codec.decode_responses(frames)
+
+    assert batch_sig is None
+    assert [response for _, response, _ in decoded] == responses
+    assert [topic for topic, _, _ in decoded] == [BATCH_ID, "héllo wörld"]
+    assert [sig for _, _, sig in decoded] == (signatures or [None, None])
+
+
+@pytest.mark.parametrize(
+    "value", ["héllo", "日本語", "deadbeef", "aGVsbG8=", "not base64!", "", "Zm9v\n"]
+)
+def test_binary_text_round_trip(value):
+    writer = BinaryWriter(KIND_ECHO)
+    writer.text(value)
+
+    assert BinaryReader(writer.getvalue(), KIND_ECHO).text() == value
+
+
+@pytest.mark.parametrize("message", [batched_message(), echo()], ids=["bm", "echo"])
+def test_truncated_binary_frames(message):
+    frame = BINARY_CODEC.encode_message(message)
+
+    for size in range(len(frame)):
+        with pytest.raises(DECODE_ERRORS):
+            BINARY_CODEC.decode_message(frame[:size])
+
+
+def test_truncated_binary_responses():
+    frames = BINARY_CODEC.encode_responses(
+        [Response(message_type="EchoResponse", topic=BATCH_ID, creator=KEY)], [SIGNATURE]
+    )
+
+    for size in range(len(frames[0])):
+        with pytest.raises(DECODE_ERRORS):
+            BINARY_CODEC.decode_responses([frames[0][:size]])
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        b"",
+        b"{",
+        b"\xff\xfe",
+        b'{"message_type": "EchoSubscribe"}',
+        b'{"message_type": "NoSuchMessage"}',
+        b'{"message_type": "EchoSubscribe", "batched_messages_hash": 5, "creator": [1, 2]}',
+        b'{"message_type": "EchoSubscribe", "batched_messages_hash": "ab", "creator": 7}',
+        b"[1, 2]",
+    ],
+)
+def test_malformed_json_messages(frame):
+    with pytest.raises(DECODE_ERRORS):
+        JSON_CODEC.decode_message(frame)
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+@pytest.mark.parametrize("frame", [b"", b"[1]", b"[1, 2, 3]", b'["a", "b"]', b"7", b"\x00" * 63])
+def test_malformed_signatures(codec, frame):
+    with pytest.raises(DECODE_ERRORS):
+        codec.decode_signature(frame)
+
+
+@pytest.mark.parametrize("message", [batched_message(), echo()], ids=["bm", "echo"])
+@pytest.mark.parametrize("key", [(2**300, -1), ("a", "b"), (1.5, 2), (1, 2, 3)])
+def test_malformed_keys(message, key):
+    # Peer ids are worked out from these keys before any signature check
+    encoded = JSON_CODEC.encode_message(message)
+    frame = encoded.replace(b"[%d, %d]" % KEY, json.dumps(key).encode())
+    assert frame != encoded
+
+    with pytest.raises(DECODE_ERRORS):
+        JSON_CODEC.decode_message(frame)
+
+
+@pytest.mark.parametrize(
+    "clock", [[["a1b2", "3"]], [["a1b2", None]], [["a1b2"]], [5], [[1, 2]]]
+)
+def test_malformed_vector_clocks(clock):
+    # The batch id sums the counts before any signature is checked
+    encoded = JSON_CODEC.encode_message(batched_message())
+    frame = encoded.replace(
+        b'[["a1b2", 3], ["c3d4", 0]]', json.dumps(clock).encode()
+    )
+    assert frame != encoded
+
+    with pytest.raises(DECODE_ERRORS):
+        JSON_CODEC.decode_message(frame)
+
+
+def test_short_json_responses():
+    frames = JSON_CODEC.encode_responses(
+        [Response(message_type="EchoResponse", topic=BATCH_ID, creator=KEY)], [SIGNATURE]
+    )
+
+    with pytest.raises(DECODE_ERRORS):
+        JSON_CODEC.decode_responses(frames[:1] + [b"{}"] + frames[2:])
+    with pytest.raises(DECODE_ERRORS):
+        JSON_CODEC.decode_responses(frames[:2] + [b"[1, 2, 3]"])
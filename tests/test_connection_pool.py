@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+import time
+
+import aiozmq
+import pytest
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.connection_pool import ConnectionPool  # noqa: E402
+
+
+async def serve_ok(router: aiozmq.ZmqStream):
+    while True:
+        frames = await router.read()
+        delimiter = frames.index(b"")
+        router.write(frames[: delimiter + 1] + [b"OK"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("transport_mode", ["req", "dealer"])
+async def test_dead_peer_does_not_block_others(tmp_path, transport_mode):
+    live = f"ipc://{tmp_path}/live"
+    dead = f"ipc://{tmp_path}/dead"  # nothing listens here
+
+    router = await aiozmq.create_zmq_stream(zmq.ROUTER, bind=live)
+    server = asyncio.create_task(serve_ok(router))
+    waits = []
+    pool = ConnectionPool(transport_mode, 30, on_lock_wait=waits.append)
+
+    try:
+        stuck = asyncio.create_task(pool.request(dead, [b"ping"], 2))
+        await asyncio.sleep(0.1)
+
+        started = time.monotonic()
+        assert await pool.request(live, [b"ping"]) == [b"OK"]
+        assert time.monotonic() - started < 1
+
+        with pytest.raises(asyncio.TimeoutError):
+            await stuck
+    finally:
+        server.cancel()
+        pool.close()
+        router.close()
+
+    if transport_mode == "req":
+        assert max(waits) < 1
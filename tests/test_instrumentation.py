@@ -0,0 +1,102 @@
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.instrumentation import HALF_BUCKETS  # noqa: E402
+from iot_node.instrumentation import Instrumentation  # noqa: E402
+from iot_node.instrumentation import LatencyHistogram  # noqa: E402
+from iot_node.instrumentation import bucket_index  # noqa: E402
+from iot_node.instrumentation import bucket_value  # noqa: E402
+
+
+def durations(count: int, seed: int = 5) -> list:
+    # Log-normal around a few milliseconds, with a long tail
+    rng = random.Random(seed)
+    return [rng.lognormvariate(-6, 1.5) for _ in range(count)]
+
+
+def test_buckets_stay_within_their_precision():
+    rng = random.Random(1)
+    values = list(range(1000)) + [rng.randrange(1, 2**40) for _ in range(10000)]
+    previous = -1
+
+    for value in sorted(values):
+        index = bucket_index(value)
+        assert index >= previous
+        previous = index
+
+        assert abs(bucket_value(index) - value) <= value / HALF_BUCKETS
+
+
+def test_percentiles_match_numpy():
+    samples = durations(20000)
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.record(sample)
+
+    for quantile in [0.5, 0.9, 0.99, 0.999]:
+        expected = np.quantile(samples, quantile, method="inverted_cdf")
+        assert histogram.percentile(quantile) == pytest.approx(
+            expected, rel=2 / HALF_BUCKETS, abs=1e-6
+        )
+
+    assert histogram.percentile(0) == histogram.min == min(samples)
+    assert histogram.percentile(1) == pytest.approx(max(samples), rel=2 / HALF_BUCKETS)
+    assert histogram.snapshot()["mean"] == pytest.approx(np.mean(samples))
+
+
+def test_empty_histogram():
+    snapshot = LatencyHistogram().snapshot()
+
+    assert snapshot["count"] == 0
+    assert snapshot["mean"] is None
+    assert snapshot["p99"] is None
+
+
+def test_merge_equals_recording_everything():
+    samples = durations(2000)
+    merged = Instrumentation.merge(
+        [Instrumentation(), Instrumentation(), Instrumentation()]
+    )
+    assert merged.snapshot() == Instrumentation().snapshot()
+
+    parts = [Instrumentation() for _ in range(3)]
+    combined = Instrumentation()
+    for i, sample in enumerate(samples):
+        parts[i % 3].record("verify", sample)
+        parts[i % 3].count("batches")
+        combined.record("verify", sample)
+        combined.count("batches")
+
+    merged = Instrumentation.merge(parts).snapshot()
+    expected = combined.snapshot()
+
+    assert merged["counters"] == expected["counters"] == {"batches": 2000}
+    assert merged["stages"]["verify"] == pytest.approx(expected["stages"]["verify"])
+
+
+def test_disabled_records_nothing():
+    instrumentation = Instrumentation(enabled=False)
+    instrumentation.record("verify", 0.1)
+    instrumentation.count("batches")
+    with instrumentation.timer("publish"):
+        pass
+
+    assert instrumentation.snapshot() == {"stages": {}, "counters": {}}
+
+
+def test_scrape():
+    instrumentation = Instrumentation()
+    instrumentation.record("verify", 0.002)
+    instrumentation.count("batches", 3)
+
+    lines = instrumentation.scrape({"node": "a1"}).splitlines()
+
+    assert 'racer_stage_seconds_count{node="a1",stage="verify"} 1' in lines
+    assert 'racer_events_total{node="a1",event="batches"} 3' in lines
+    assert 'racer_stage_seconds{node="a1",stage="verify",quantile="0.5"} 0.002' in lines
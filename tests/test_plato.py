@@ -0,0 +1,79 @@
+import os
+import random
+import sys
+from collections import deque
+
+import numpy as np
+import pytest
+from scipy.signal import savgol_filter
+from talipp.indicators import RSI
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.plato import LatencyTrend  # noqa: E402
+from iot_node.plato import RollingLinearFit  # noqa: E402
+
+
+def latencies(trend: float, count: int, seed: int = 3) -> list:
+    # Noisy round trips around 2 seconds, rising by trend per sample
+    rng = random.Random(seed)
+    return [2 + trend * i + rng.gauss(0, 0.3) for i in range(count)]
+
+
+def old_rsi(samples, window: int) -> float:
+    # What the congestion jobs computed on every check before plato.py
+    return RSI(window, list(savgol_filter(list(samples), window, 1)))[-1]
+
+
+@pytest.mark.parametrize("window", [14, 21])
+def test_fit_matches_savgol(window):
+    fit = RollingLinearFit(window, recompute_every=50)
+    samples = latencies(0.01, 300)
+
+    for i, sample in enumerate(samples):
+        fit.update(sample)
+
+        if i + 1 >= window:
+            recent = samples[i + 1 - window : i + 1]
+            assert fit.value == pytest.approx(savgol_filter(recent, window, 1)[-1])
+            line = np.polyfit(np.arange(window), recent, 1)
+            assert fit.at(3) == pytest.approx(np.polyval(line, 3))
+
+
+@pytest.mark.parametrize("trend", [0, 0.002, 0.01, -0.01])
+def test_rsi_matches_old_calculation(trend):
+    trend_tracker = LatencyTrend()
+    # Node kept the last 100 samples and recomputed over them
+    recent = deque(maxlen=100)
+
+    for i, sample in enumerate(latencies(trend, 400)):
+        trend_tracker.update(sample)
+        recent.append(sample)
+
+        if len(recent) < 22:
+            assert trend_tracker.long_rsi.value is None
+            continue
+
+        for window, rsi in [(14, trend_tracker.short_rsi), (21, trend_tracker.long_rsi)]:
+            # Identical until the old window starts dropping samples, the
+            # stream keeps their (decayed) weight after that
+            tolerance = 1e-6 if len(recent) == i + 1 else 2.0
+            assert rsi.value == pytest.approx(old_rsi(recent, window), abs=tolerance)
+
+
+def test_rsi_crosses_plato_thresholds():
+    # The congestion jobs act above 70 and below 30
+    rising = LatencyTrend()
+    falling = LatencyTrend()
+    above = below = 0
+
+    for rise, fall in zip(latencies(0.01, 300), latencies(-0.01, 300, seed=4)):
+        rising.update(rise)
+        falling.update(fall + 5)
+
+        if rising.short_rsi.value is not None:
+            above += rising.short_rsi.value > 70
+            below += falling.short_rsi.value < 30
+
+    assert above > 100
+    assert below > 100
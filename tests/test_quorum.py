@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.quorum import QuorumCounter  # noqa: E402
+from iot_node.quorum import QuorumTracker  # noqa: E402
+
+SAMPLE = {"a", "b", "c", "d"}
+
+
+def test_counts_each_sampled_peer_once():
+    counter = QuorumCounter(set(SAMPLE))
+
+    for peer_id in ["a", "a", "outsider", "b", "b", "outsider"]:
+        counter.add(peer_id)
+
+    assert counter.count == 2
+    assert counter.repliers == {"a", "b"}
+
+
+def test_thresholds():
+    counter = QuorumCounter(set(SAMPLE))
+
+    assert counter.reached(0)
+    assert not counter.reached(1)
+
+    for count, peer_id in enumerate(sorted(SAMPLE), start=1):
+        counter.add(peer_id)
+        assert counter.reached(count)
+        assert not counter.reached(count + 1)
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_once_threshold_is_reached():
+    counter = QuorumCounter(set(SAMPLE))
+    waiting = asyncio.create_task(counter.wait(3, 5))
+
+    for peer_id in ["a", "b", "b", "outsider"]:
+        counter.add(peer_id)
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+    counter.add("c")
+    assert await waiting
+    assert counter.waiters == []
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out_below_threshold():
+    counter = QuorumCounter(set(SAMPLE))
+    counter.add("a")
+
+    assert await counter.wait(1, 0.01)
+    assert not await counter.wait(2, 0.01)
+    assert counter.waiters == []
+
+
+@pytest.mark.asyncio
+async def test_waiters_share_a_counter():
+    counter = QuorumCounter(set(SAMPLE))
+    low = asyncio.create_task(counter.wait(1, 5))
+    high = asyncio.create_task(counter.wait(4, 0.05))
+    await asyncio.sleep(0)
+
+    counter.add("a")
+
+    assert await low
+    assert not await high
+
+
+def test_tracker_keeps_echo_and_ready_apart():
+    tracker = QuorumTracker.from_samples({"a", "b"}, {"b", "c"})
+
+    tracker.echo.add("a")
+    tracker.ready.add("a")
+    tracker.ready.add("c")
+
+    assert tracker.echo_count == 1
+    assert tracker.ready_count == 1
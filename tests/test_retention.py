@@ -0,0 +1,85 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node import retention  # noqa: E402
+from iot_node.retention import StateRetention  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(retention, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_keys_expire_after_retention_time(clock):
+    state = StateRetention(retention_time=10, max_tombstones=100)
+    state.schedule(b"first")
+    clock.now += 4
+    state.schedule(b"second")
+
+    clock.now += 5.9
+    assert state.pop_expired() == []
+    assert state.pending() == 2
+
+    clock.now += 0.1
+    assert state.pop_expired() == [b"first"]
+    assert state.pop_expired() == []
+
+    clock.now += 4
+    assert state.pop_expired() == [b"second"]
+    assert state.pending() == 0
+    assert state.expired_count == 2
+
+
+def test_expired_keys_come_out_oldest_first(clock):
+    state = StateRetention(retention_time=1, max_tombstones=100)
+    for i in range(5):
+        state.schedule(bytes([i]))
+        clock.now += 0.1
+
+    clock.now += 10
+    assert state.pop_expired() == [bytes([i]) for i in range(5)]
+
+
+def test_expired_keys_are_tombstoned(clock):
+    state = StateRetention(retention_time=1, max_tombstones=100)
+    state.schedule(b"batch")
+
+    assert not state.is_tombstoned(b"batch")
+    clock.now += 1
+    state.pop_expired()
+    assert state.is_tombstoned(b"batch")
+
+
+def test_oldest_tombstones_are_dropped(clock):
+    state = StateRetention(retention_time=1, max_tombstones=3)
+    for i in range(5):
+        state.schedule(bytes([i]))
+
+    clock.now += 1
+    state.pop_expired()
+
+    assert [state.is_tombstoned(bytes([i])) for i in range(5)] == [
+        False,
+        False,
+        True,
+        True,
+        True,
+    ]
+
+
+def test_re_tombstoning_refreshes_a_key(clock):
+    state = StateRetention(retention_time=1, max_tombstones=2)
+    state.add_tombstone(b"a")
+    state.add_tombstone(b"b")
+    state.add_tombstone(b"a")
+    state.add_tombstone(b"c")
+
+    assert state.is_tombstoned(b"a")
+    assert not state.is_tombstoned(b"b")
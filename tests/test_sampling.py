@@ -0,0 +1,112 @@
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pytest
+from scipy.stats import norm, poisson
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.sampling import ALGORITHMS  # noqa: E402
+from iot_node.sampling import POISSON_RATE  # noqa: E402
+from iot_node.sampling import PeerSampler  # noqa: E402
+from iot_node.sampling import normal_index_weights  # noqa: E402
+from iot_node.sampling import poisson_index_weights  # noqa: E402
+
+PEERS = [f"peer{i}" for i in range(20)]
+DRAWS = 20000
+
+
+def sampler(peers=PEERS, seed: int = 7) -> PeerSampler:
+    sampler = PeerSampler(rng=np.random.default_rng(seed))
+    sampler.set_peers(peers)
+    return sampler
+
+
+def frequencies(sampler: PeerSampler, algorithm: str, k: int) -> np.ndarray:
+    counts = Counter()
+    for _ in range(DRAWS):
+        counts.update(sampler.sample(algorithm, k))
+
+    return np.array([counts[peer] for peer in sampler.peer_ids]) / DRAWS
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+@pytest.mark.parametrize("k", [0, 1, 6, 20, 50])
+def test_samples_are_distinct_known_peers(algorithm, k):
+    picked = sampler().sample(algorithm, k)
+
+    assert len(picked) == min(k, len(PEERS))
+    assert picked <= set(PEERS)
+
+
+def test_no_peers():
+    assert sampler(peers=[]).sample("random", 6) == set()
+
+
+def test_random_is_uniform():
+    # Every peer is in a 6 peer sample 6 / 20 of the time
+    assert frequencies(sampler(), "random", 6) == pytest.approx(
+        np.full(len(PEERS), 6 / len(PEERS)), abs=0.015
+    )
+
+
+def test_index_weights_match_the_old_draws():
+    # What select_nodes drew: int(X) % n for normal X, Poisson(5) % n
+    rng = np.random.default_rng(1)
+    num_peers = len(PEERS)
+
+    normal_draws = norm.rvs(
+        loc=(num_peers - 1) / 2, scale=np.sqrt(num_peers), size=DRAWS * 5, random_state=rng
+    )
+    normal_counts = np.bincount(
+        [int(x) % num_peers for x in normal_draws], minlength=num_peers
+    )
+    poisson_draws = poisson.rvs(POISSON_RATE, size=DRAWS * 5, random_state=rng)
+    poisson_counts = np.bincount(poisson_draws % num_peers, minlength=num_peers)
+
+    assert normal_index_weights(num_peers) == pytest.approx(
+        normal_counts / (DRAWS * 5), abs=0.005
+    )
+    assert poisson_index_weights(num_peers) == pytest.approx(
+        poisson_counts / (DRAWS * 5), abs=0.005
+    )
+
+
+@pytest.mark.parametrize("algorithm", ["normal", "poisson"])
+def test_single_draws_follow_the_weights(algorithm):
+    peer_sampler = sampler()
+
+    assert frequencies(peer_sampler, algorithm, 1) == pytest.approx(
+        peer_sampler.index_weights(algorithm), abs=0.015
+    )
+
+
+def test_latency_prefers_healthy_peers():
+    peer_sampler = sampler(peers=["fast", "slow", "missing"])
+    peer_sampler.record_rtt("fast", 0.01)
+    peer_sampler.record_rtt("slow", 1.0)
+    peer_sampler.record_timeout("missing", 30)
+
+    weights = dict(zip(peer_sampler.peer_ids, peer_sampler.index_weights("latency")))
+
+    assert weights["fast"] > weights["slow"] > weights["missing"]
+    # The exploration share keeps every peer reachable
+    assert min(weights.values()) >= peer_sampler.exploration / 3
+
+
+def test_set_peers_keeps_measurements():
+    peer_sampler = sampler(peers=["a", "b"])
+    peer_sampler.record_rtt("b", 0.5)
+    peer_sampler.set_peers(["b", "c"])
+
+    assert peer_sampler.peer_statistics()["b"]["rtt"] == 0.5
+    assert peer_sampler.peer_statistics()["c"]["rtt"] is None
+
+
+def test_seeded_samplers_repeat():
+    first, second = sampler(seed=3), sampler(seed=3)
+
+    for algorithm in ALGORITHMS:
+        assert first.sample(algorithm, 6) == second.sample(algorithm, 6)
@@ -0,0 +1,66 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node import signature_cache  # noqa: E402
+from iot_node.signature_cache import VerifiedSignatureCache  # noqa: E402
+
+SIGNED = (b"creator bytes", (1, 2))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(
+        signature_cache, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def test_only_added_signatures_are_found(clock):
+    cache = VerifiedSignatureCache(max_entries=10, ttl=30)
+    cache.add(SIGNED)
+
+    assert cache.contains(SIGNED)
+    # Same bytes with another signature still needs checking
+    assert not cache.contains((b"creator bytes", (1, 3)))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = VerifiedSignatureCache(max_entries=10, ttl=30)
+    cache.add(SIGNED)
+
+    clock.now += 30
+    assert cache.contains(SIGNED)
+
+    clock.now += 0.1
+    assert not cache.contains(SIGNED)
+    assert SIGNED not in cache.entries
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = VerifiedSignatureCache(max_entries=2, ttl=30)
+    cache.add((b"a", (1, 1)))
+    cache.add((b"b", (1, 1)))
+    assert cache.contains((b"a", (1, 1)))
+
+    cache.add((b"c", (1, 1)))
+
+    assert cache.contains((b"a", (1, 1)))
+    assert not cache.contains((b"b", (1, 1)))
+    assert cache.contains((b"c", (1, 1)))
+
+
+def test_adding_again_extends_expiry(clock):
+    cache = VerifiedSignatureCache(max_entries=10, ttl=30)
+    cache.add(SIGNED)
+    clock.now += 20
+    cache.add(SIGNED)
+    clock.now += 20
+
+    assert cache.contains(SIGNED)
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from iot_node.crypto import DEFAULT_SIGNATURES  # noqa: E402
+from iot_node.message_classes import BatchedMessages  # noqa: E402
+from iot_node.verification import VerificationPipeline  # noqa: E402
+
+PRIVATE_KEY, PUBLIC_KEY = DEFAULT_SIGNATURES.generate_keys()
+
+
+def signed_batch(count: int) -> tuple:
+    bm = BatchedMessages(
+        message_type="BatchedMessage",
+        creator_bls="q" * 64,
+        creator_ecdsa=PUBLIC_KEY,
+        sender_ecdsa=PUBLIC_KEY,
+        messages=(),
+        aggregated_bls_signature="111",
+        merkle_root="cd" * 32,
+        vector_clock=(("a1b2", count),),
+    )
+
+    return (
+        bm,
+        DEFAULT_SIGNATURES.sign(bm.get_creator_bytes(), PRIVATE_KEY),
+        DEFAULT_SIGNATURES.sign(bm.get_sender_bytes(), PRIVATE_KEY),
+    )
+
+
+@pytest.mark.asyncio
+async def test_results_reach_callbacks_and_futures():
+    verified, failed = [], []
+    pipeline = VerificationPipeline(
+        on_verified=lambda bm, signature: verified.append(bm),
+        on_failed=failed.append,
+        workers=1,
+    )
+    pipeline.start()
+
+    try:
+        good, creator_signature, sender_signature = signed_batch(1)
+        bad, _, _ = signed_batch(2)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                pipeline.submit(good, creator_signature, sender_signature),
+                pipeline.submit(bad, creator_signature, sender_signature),
+            ),
+            30,
+        )
+    finally:
+        pipeline.stop()
+
+    assert results == [True, False]
+    assert verified == [good]
+    assert failed == [bad]
+
+
+@pytest.mark.asyncio
+async def test_pool_restarts_after_workers_die():
+    verified = []
+    pipeline = VerificationPipeline(
+        on_verified=lambda bm, signature: verified.append(bm),
+        on_failed=lambda bm: None,
+        workers=1,
+    )
+    pipeline.start()
+
+    try:
+        first = signed_batch(1)
+        assert await asyncio.wait_for(pipeline.submit(*first), 30)
+
+        broken = pipeline.executor
+        for process in list(broken._processes.values()):
+            process.kill()
+
+        second = signed_batch(2)
+        assert await asyncio.wait_for(pipeline.submit(*second), 30)
+    finally:
+        pipeline.stop()
+
+    assert pipeline.executor is not broken
+    assert verified == [first[0], second[0]]